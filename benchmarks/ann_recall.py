@@ -0,0 +1,86 @@
+"""
+Recall vs latency of the IVF-flat question index compared to the exact search.
+
+Usage:
+    python benchmarks/ann_recall.py --size 200000 --dim 768
+    python benchmarks/ann_recall.py --db questions.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path to import from project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.vector_index import VectorIndex
+from utils.ann_index import IVFFlatIndex
+from utils.embedding_storage import unpack_embedding
+
+
+def synthetic_embeddings(size, dim, n_topics=2000, seed=0):
+    """Clustered vectors that loosely mimic question embeddings: many questions per topic."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, n_topics, size)] + 1.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors
+
+
+def stored_embeddings(db_path):
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT embedding FROM questions WHERE typeof(embedding) = 'blob'").fetchall()
+    return np.stack([unpack_embedding(blob) for (blob,) in rows])
+
+
+def timed_searches(index, queries, k, **kwargs):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([item_id for item_id, _ in index.search(query, k=k, **kwargs)])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of the synthetic vectors")
+    parser.add_argument("--db", help="benchmark on the embeddings stored in this database instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=0, help="0: sqrt(size)")
+    args = parser.parse_args()
+
+    vectors = stored_embeddings(args.db) if args.db else synthetic_embeddings(args.size, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed copies of stored rows, like a re-phrased question
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) * queries.std()
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    exact = VectorIndex()
+    exact.add_many(enumerate(vectors))
+    truth, exact_ms = timed_searches(exact, queries, args.k)
+
+    ivf = IVFFlatIndex(n_lists=args.n_lists, train_threshold=0)
+    ivf.add_many(enumerate(vectors))
+    start = time.perf_counter()
+    ivf.train()
+    print(f"IVF training: {time.perf_counter() - start:.1f}s, {len(ivf._centroids)} lists\n")
+
+    print(f"{'search':<16}{'recall@' + str(args.k):>12}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<16}{1.0:>12.3f}{exact_ms:>12.2f}{1.0:>10.1f}")
+    n_probe = 1
+    while n_probe <= len(ivf._centroids):
+        found, ivf_ms = timed_searches(ivf, queries, args.k, n_probe=n_probe)
+        recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+        print(f"{'ivf n_probe=' + str(n_probe):<16}{recall:>12.3f}{ivf_ms:>12.2f}{exact_ms / ivf_ms:>10.1f}")
+        if recall == 1.0:
+            break
+        n_probe *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Precision, recall and speed of the rule-based error-message detector, and the share
+of is_error_message calls it keeps away from the LLM.
+
+The labelled corpus (benchmarks/error_messages.jsonl) mixes pasted tracebacks,
+compiler, runtime and database errors in Python, Rust, C++, JavaScript, Java, SQL and
+shell with regular questions, some of which talk about errors without containing one.
+The labels follow the LLM prompt: does the text contain an error message?
+
+With --provider, the texts the rules leave undecided are sent to the LLM, which gives
+the precision and recall of the combined detector.
+
+Usage:
+    python benchmarks/error_detection.py
+    python benchmarks/error_detection.py --provider openai
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+# Add parent directory to path to import from project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import OPENAI_API_KEY
+from utils.error_detection import detect_error_message
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "error_messages.jsonl")
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def precision_recall(pairs):
+    """Precision and recall of the error class over (predicted, expected) pairs."""
+    true_positives = sum(1 for predicted, expected in pairs if predicted and expected)
+    predicted_errors = sum(1 for predicted, _ in pairs if predicted)
+    errors = sum(1 for _, expected in pairs if expected)
+    precision = true_positives / predicted_errors if predicted_errors else float("nan")
+    recall = true_positives / errors if errors else float("nan")
+    return precision, recall
+
+
+def make_provider(name):
+    if name == "openai":
+        from llm_providers.openai_provider import OpenAIProvider
+        return OpenAIProvider(OPENAI_API_KEY)
+    from llm_providers.ollama_provider import OllamaProvider
+    return OllamaProvider()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--provider", choices=("openai", "ollama"), help="send the undecided texts to this LLM")
+    parser.add_argument("--model", help="model of the provider")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus for the timing")
+    parser.add_argument("--verbose", action="store_true", help="list the wrong and undecided texts")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    decisions = [detect_error_message(item["text"]) for item in corpus]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for item in corpus:
+            detect_error_message(item["text"])
+    us_per_call = (time.perf_counter() - start) / (args.repeat * len(corpus)) * 1e6
+
+    errors = sum(item["is_error"] for item in corpus)
+    print(f"{len(corpus)} labelled texts ({errors} error messages, {len(corpus) - errors} questions)\n")
+
+    print(f"{'language':<12}{'texts':>7}{'decided':>9}{'correct':>9}")
+    by_language = defaultdict(list)
+    for item, decision in zip(corpus, decisions):
+        by_language[item["language"]].append((decision, item["is_error"]))
+    for language, pairs in sorted(by_language.items()):
+        decided = [(d, e) for d, e in pairs if d is not None]
+        correct = sum(d == e for d, e in decided)
+        print(f"{language:<12}{len(pairs):>7}{len(decided):>9}{correct:>9}")
+
+    decided = [(d, item["is_error"]) for item, d in zip(corpus, decisions) if d is not None]
+    precision, recall = precision_recall(decided)
+    rule_recall = sum(1 for item, d in zip(corpus, decisions) if d and item["is_error"]) / errors
+    print(f"\nDecided by the rules: {len(decided)}/{len(corpus)} ({len(decided) / len(corpus):.1%} fewer LLM calls)")
+    print(f"Accuracy of the decided texts: {sum(d == e for d, e in decided) / len(decided):.1%}")
+    print(f"Error class on the decided texts: precision {precision:.1%}, recall {recall:.1%}")
+    print(f"Error messages caught by the rules alone: {rule_recall:.1%}")
+    print(f"Rules: {us_per_call:.1f} µs per text")
+
+    if args.verbose:
+        print()
+        for item, decision in zip(corpus, decisions):
+            if decision is None or decision != item["is_error"]:
+                status = "undecided" if decision is None else "WRONG"
+                print(f"{status:<10}{item['language']:<10}{item['text'][:90]!r}")
+
+    if args.provider:
+        provider = make_provider(args.provider).uncached()
+        combined, llm_seconds = [], []
+        for item, decision in zip(corpus, decisions):
+            if decision is None:
+                start = time.perf_counter()
+                decision = provider.is_error_message(item["text"], model=args.model)
+                llm_seconds.append(time.perf_counter() - start)
+            combined.append((decision, item["is_error"]))
+        precision, recall = precision_recall(combined)
+        print(f"\nRules, then {args.provider} for the {len(llm_seconds)} undecided texts:")
+        print(f"precision {precision:.1%}, recall {recall:.1%}, "
+              f"accuracy {sum(d == e for d, e in combined) / len(combined):.1%}")
+        if llm_seconds:
+            print(f"LLM: {sum(llm_seconds) / len(llm_seconds) * 1000:.0f} ms per text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-call HTTP overhead of OllamaProvider: a new connection per call (module-level
+requests.post, as before) against the pooled keep-alive requests.Session and the
+pooled async httpx client.
+
+A local stand-in for the Ollama server answers instantly (or after --latency ms),
+so the timings are the client and connection overhead alone.
+
+Usage:
+    python benchmarks/ollama_http_overhead.py --calls 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add parent directory to path to import from project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_providers.ollama_provider import OllamaProvider
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama with stream=False, over keep-alive HTTP/1.1."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({"model": request.get("model"), "response": "ok", "done": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(latency):
+    StandInOllama.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllama)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def timed_sync(provider, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        provider.get_response("ping", model="stand-in")
+    return (time.perf_counter() - start) / calls * 1000
+
+
+async def timed_async(provider, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call():
+        async with semaphore:
+            await provider.aget_response("ping", model="stand-in")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(calls)))
+    elapsed = (time.perf_counter() - start) / calls * 1000
+    await provider.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent calls of the async client")
+    parser.add_argument("--latency", type=float, default=0.0, help="server-side delay per call, in ms")
+    parser.add_argument("--url", help="benchmark a running server instead of the local stand-in")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args.latency / 1000)
+
+    # Before: module-level requests.post, i.e. a new TCP connection for every call
+    unpooled = OllamaProvider(url)
+    unpooled.session = requests
+    pooled = OllamaProvider(url, pool_size=args.concurrency)
+
+    # Warm up both paths (imports, first connection)
+    timed_sync(unpooled, 5)
+    timed_sync(pooled, 5)
+
+    print(f"{args.calls} calls to {url}\n")
+    print(f"{'client':<44}{'ms/call':>10}")
+    results = [
+        ("requests.post, new connection per call", timed_sync(unpooled, args.calls)),
+        ("pooled requests.Session (keep-alive)", timed_sync(pooled, args.calls)),
+        ("pooled httpx.AsyncClient, sequential", asyncio.run(timed_async(pooled, args.calls, 1))),
+        (f"pooled httpx.AsyncClient, {args.concurrency} concurrent",
+         asyncio.run(timed_async(pooled, args.calls, args.concurrency))),
+    ]
+    for name, ms in results:
+        print(f"{name:<44}{ms:>10.3f}")
+
+    pooled.close()
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Offline accuracy and latency of the embedding theme classifier against the LLM labels.
+
+Every fifth LLM-labelled question of the database (by id) is held out; the classifier
+is fitted on the others. For a range of confidence margins, the report gives the share
+of held-out questions labelled locally and the theme/subtheme accuracy of those labels,
+taking the stored LLM labels as the truth. The label descriptions are embedded with
+the embedding model of the app, so its Ollama server must be running.
+
+With --provider, the per-call latency of the local prediction is compared to the LLM
+analysis call with every category (what a question costs without the classifier) and
+with only the predicted labels (what is left to the LLM when the classifier is sure).
+
+Usage:
+    python benchmarks/theme_classifier_report.py --db questions.db
+    python benchmarks/theme_classifier_report.py --db questions.db --provider ollama --llm-sample 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path to import from project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import OPENAI_API_KEY, THEME_ANALYSIS_MODEL, THEME_CLASSIFIER_MIN_EXAMPLES, THEME_CLASSIFIER_PRIOR_WEIGHT
+from database import get_connection
+from utils.theme_classifier import EmbeddingThemeClassifier, load_labelled_questions
+
+MARGINS = (0.0, 0.01, 0.02, 0.03, 0.05, 0.08, 0.12)
+
+
+def split(rows, holdout_every=5):
+    train = [row for row in rows if row[0] % holdout_every]
+    test = [row for row in rows if not row[0] % holdout_every]
+    return train, test
+
+
+def evaluate(classifier, test):
+    """Predictions, margins and ms per prediction over the held-out questions."""
+    start = time.perf_counter()
+    predictions = [classifier.predict(embedding) for *_, embedding in test]
+    ms = (time.perf_counter() - start) / max(len(test), 1) * 1000
+    return predictions, ms
+
+
+def report_margins(classifier, test, predictions):
+    print(f"{'margin':>8}{'local':>10}{'theme acc':>12}{'subtheme acc':>14}{'full prompt':>13}")
+    for margin in MARGINS:
+        classifier.min_margin = margin
+        local = theme_ok = subtheme_ok = 0
+        for (_, _, theme, subtheme, embedding), prediction in zip(test, predictions):
+            if classifier.classify(embedding) is None:
+                continue
+            local += 1
+            theme_ok += prediction[0] == theme
+            subtheme_ok += prediction[0] == theme and prediction[1] == subtheme
+        share = local / len(test)
+        theme_acc = theme_ok / local if local else float("nan")
+        subtheme_acc = subtheme_ok / local if local else float("nan")
+        # Questions labelled locally still get an analysis call, but with their labels only
+        print(f"{margin:>8.2f}{share:>10.1%}{theme_acc:>12.1%}{subtheme_acc:>14.1%}{1 - share:>13.1%}")
+
+
+def make_provider(name):
+    if name == "openai":
+        from llm_providers.openai_provider import OpenAIProvider
+        return OpenAIProvider(OPENAI_API_KEY)
+    from llm_providers.ollama_provider import OllamaProvider
+    return OllamaProvider()
+
+
+def report_latency(provider, sample, predictions, local_ms, model):
+    provider = provider.uncached()
+    full, reduced = [], []
+    for (_, question, *_), (theme, subtheme, _, _) in zip(sample, predictions):
+        start = time.perf_counter()
+        provider.analyze_question(question, model=model)
+        full.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        provider.analyze_question(question, model=model, categories={theme: [subtheme or "other"]})
+        reduced.append(time.perf_counter() - start)
+    print(f"\n{'per call':<44}{'ms':>10}")
+    print(f"{'local prediction':<44}{local_ms:>10.3f}")
+    print(f"{'LLM analysis, every category':<44}{np.mean(full) * 1000:>10.1f}")
+    print(f"{'LLM analysis, predicted labels only':<44}{np.mean(reduced) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="questions.db")
+    parser.add_argument("--min-examples", type=int, default=THEME_CLASSIFIER_MIN_EXAMPLES)
+    parser.add_argument("--prior-weight", type=float, default=THEME_CLASSIFIER_PRIOR_WEIGHT)
+    parser.add_argument("--provider", choices=("openai", "ollama"), help="also time the LLM analysis calls")
+    parser.add_argument("--model", default=THEME_ANALYSIS_MODEL)
+    parser.add_argument("--llm-sample", type=int, default=10, help="questions sent to the LLM for the latency comparison")
+    args = parser.parse_args()
+
+    with get_connection(args.db) as conn:
+        rows = load_labelled_questions(conn)
+    train, test = split(rows)
+    if not test:
+        sys.exit(f"Not enough LLM-labelled questions with an embedding in {args.db} ({len(rows)})")
+    print(f"{len(rows)} LLM-labelled questions: {len(train)} to fit, {len(test)} held out\n")
+
+    print("Label descriptions only (no labelled questions):")
+    zero_shot = EmbeddingThemeClassifier(min_examples=0, prior_weight=args.prior_weight)
+    zero_shot.fit()
+    predictions, _ = evaluate(zero_shot, test)
+    report_margins(zero_shot, test, predictions)
+
+    print("\nLabel descriptions and centroids of the labelled questions:")
+    classifier = EmbeddingThemeClassifier(min_examples=args.min_examples, prior_weight=args.prior_weight)
+    classifier.fit((theme, subtheme, embedding) for _, _, theme, subtheme, embedding in train)
+    predictions, local_ms = evaluate(classifier, test)
+    report_margins(classifier, test, predictions)
+
+    if args.provider:
+        report_latency(make_provider(args.provider), test[:args.llm_sample], predictions, local_ms, args.model)
+    else:
+        print(f"\nLocal prediction: {local_ms:.3f} ms per question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Speed of the weekly aggregations of utils/data_aggregation (set-based SQL with strftime
+and json_extract) against the per-row Python they replace, on a synthetic table.
+
+The table has the schema of database/init_db.py. Its timestamps span three years, and its
+metadata mixes valid difficulties, out-of-range and non-numeric ones, malformed JSON and
+NULLs. The Python reference parses every timestamp with datetime.fromisoformat (weeks
+keyed by ISO year, like the SQL) and every metadata with validate_metadata, then sorts
+the week keys like routes/visualization.py did. Both sides must return the same weeks,
+in the same order. get_questions_by_week returns every row, so its time is bounded by
+reading the rows, which is also reported.
+
+Usage:
+    python benchmarks/week_aggregation.py
+    python benchmarks/week_aggregation.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import from project
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.data_aggregation import get_difficulty_by_week, get_questions_by_week
+from utils.data_validation import validate_metadata
+
+
+def make_metadata(rng):
+    kind = rng.random()
+    if kind < 0.6:
+        return json.dumps({"difficulty": rng.randint(1, 10), "topic": "x"})
+    if kind < 0.75:
+        return json.dumps({"difficulty": round(rng.uniform(-2, 12), 1)})
+    if kind < 0.82:
+        return json.dumps({"difficulty": "hard"})
+    if kind < 0.88:
+        return json.dumps({"topic": "no difficulty"})
+    if kind < 0.92:
+        return "{not json"
+    return None
+
+
+def build_table(path, rows, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            question TEXT NOT NULL,
+            timestamp TEXT,
+            model_name TEXT,
+            metadata TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO questions (question, timestamp, model_name, metadata) VALUES (?, ?, ?, ?)",
+        ((f"question {i}", (start + timedelta(seconds=rng.randrange(3 * 365 * 86400))).isoformat(sep=" "),
+          "model", make_metadata(rng)) for i in range(rows))
+    )
+    conn.commit()
+    return conn
+
+
+def week_key(timestamp):
+    year, week, _ = datetime.fromisoformat(timestamp).isocalendar()
+    return f"{week}-{year}"
+
+
+def sort_week_keys(keys):
+    return sorted(keys, key=lambda x: tuple(map(int, x.split('-')[::-1])))
+
+
+def python_questions_by_week(conn):
+    questions_by_week = {}
+    for question in conn.execute("SELECT id, question, timestamp, model_name, metadata FROM questions ORDER BY timestamp"):
+        questions_by_week.setdefault(week_key(question[2]), []).append(question)
+    return {key: questions_by_week[key] for key in sort_week_keys(questions_by_week)}
+
+
+def python_difficulty_by_week(conn):
+    totals, counts = {}, {}
+    for timestamp, metadata in conn.execute("SELECT timestamp, metadata FROM questions WHERE metadata IS NOT NULL ORDER BY timestamp"):
+        key = week_key(timestamp)
+        metadata_dict = validate_metadata(metadata)
+        if metadata_dict and 'difficulty' in metadata_dict:
+            totals[key] = totals.get(key, 0) + metadata_dict['difficulty']
+            counts[key] = counts.get(key, 0) + 1
+    return {key: round(totals[key] / counts[key], 2) for key in sort_week_keys(totals)}
+
+
+def read_rows(conn):
+    return conn.execute("SELECT id, question, timestamp, model_name, metadata FROM questions ORDER BY timestamp").fetchall()
+
+
+def timed(func, conn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(conn)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each aggregation, the best one is kept")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        conn = build_table(os.path.join(directory, "questions.db"), args.rows)
+        print(f"Built {args.rows} questions in {time.perf_counter() - start:.1f} s\n")
+
+        print(f"{'aggregation':<24}{'python s':>10}{'sql s':>8}{'speedup':>9}{'weeks':>7}")
+        for name, python_func, sql_func in (
+            ("questions by week", python_questions_by_week, get_questions_by_week),
+            ("difficulty by week", python_difficulty_by_week, get_difficulty_by_week),
+        ):
+            expected, python_seconds = timed(python_func, conn, args.repeat)
+            result, sql_seconds = timed(sql_func, conn, args.repeat)
+            assert list(result) == list(expected), f"{name}: different weeks or order"
+            if name == "difficulty by week":
+                # Sums in a different order may differ in the last bit, then round differently
+                assert all(abs(result[key] - expected[key]) <= 0.01 for key in expected), f"{name}: different averages"
+            else:
+                assert result == expected, f"{name}: different questions"
+            print(f"{name:<24}{python_seconds:>10.2f}{sql_seconds:>8.2f}{python_seconds / sql_seconds:>8.1f}x{len(result):>7}")
+
+        _, read_seconds = timed(read_rows, conn, args.repeat)
+        print(f"\nReading the {args.rows} rows alone (ORDER BY timestamp): {read_seconds:.2f} s")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,59 @@ load_dotenv()
 # API Keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+# SQLite database of the FastAPI app
+DB_PATH = os.getenv("DB_PATH", "questions.db")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))  # page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes of the file read through mmap
+ANALYZE_INTERVAL_HOURS = float(os.getenv("ANALYZE_INTERVAL_HOURS", "6"))  # refresh of the query planner statistics
+DB_READER_THREADS = int(os.getenv("DB_READER_THREADS", "4"))  # threads running read queries, next to a single writer thread
+DATABASE_PAGE_SIZE = int(os.getenv("DATABASE_PAGE_SIZE", "50"))  # questions per page of /database
+CONVERSATIONS_PAGE_SIZE = int(os.getenv("CONVERSATIONS_PAGE_SIZE", "50"))  # conversations per page of /conversations
+
+# Background enrichment of new questions (classification and embedding)
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "5"))
+
+# Number of embeddings kept in memory in front of the embedding_cache table
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))  # least recently used rows of the table are evicted beyond
+
+# Semantic cache of answers: a question this similar to a previous one (same provider and model) gets its answer
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_TTL_HOURS = float(os.getenv("ANSWER_CACHE_TTL_HOURS", str(7 * 24)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))  # least recently used entries are evicted beyond
+
+# Opt-in on-disk cache of the deterministic provider calls (classification, zero-shot prompting)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "64"))  # least recently used responses are evicted beyond
+
+# Local theme/subtheme classifier over the question embeddings, the LLM labels the questions it is unsure of
+THEME_CLASSIFIER_ENABLED = os.getenv("THEME_CLASSIFIER_ENABLED", "true").lower() == "true"
+THEME_CLASSIFIER_MIN_MARGIN = float(os.getenv("THEME_CLASSIFIER_MIN_MARGIN", "0.02"))  # cosine similarity lead over the runner-up label
+THEME_CLASSIFIER_MIN_EXAMPLES = int(os.getenv("THEME_CLASSIFIER_MIN_EXAMPLES", "10"))  # LLM-labelled questions of a theme before it is predicted locally
+THEME_CLASSIFIER_PRIOR_WEIGHT = float(os.getenv("THEME_CLASSIFIER_PRIOR_WEIGHT", "5"))  # the label description counts as this many questions
+
+# Similar-question index: "exact" (brute force) or "ivf" (approximate, persisted to ANN_INDEX_PATH)
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND", "exact")
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "question_index.npz")
+ANN_N_LISTS = int(os.getenv("ANN_N_LISTS", "0"))  # 0: sqrt(number of questions)
+ANN_N_PROBE = int(os.getenv("ANN_N_PROBE", "8"))  # more probes: better recall, slower search
+
+# HTTP client of the Ollama provider
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))  # connections kept open to the server
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))  # seconds
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))  # seconds between two chunks of a response
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))  # seconds an idle connection stays open
+
+# Chat history sent with every message: a rolling summary of the older turns, then the latest turns verbatim (utils.chat_history)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))  # estimated tokens of a chat prompt; the new message is always sent whole
+CHAT_HISTORY_RECENT_TURNS = int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "4"))  # latest user/assistant exchanges never folded into the summary
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "")  # empty: the model of the chat
+
 # Default LLM provider
 DEFAULT_PROVIDER = "openai"
 DICT_DEFAULT_MODEL = {
@@ -0,0 +1 @@
+from .connection import connect, get_connection, close_all_connections
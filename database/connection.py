@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+import weakref
+
+from config import DB_PATH, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+
+# Applied to every pooled connection. WAL lets readers run alongside a writer; with WAL,
+# synchronous=NORMAL is still safe against corruption and avoids an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Number of prepared statements kept per connection (sqlite3 reuses them for identical SQL)
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds a connection waits on a locked database before raising
+BUSY_TIMEOUT = 10.0
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that can be tracked weakly, so connections of finished threads are freed."""
+
+
+_local = threading.local()
+_all_connections = weakref.WeakSet()
+_all_connections_lock = threading.Lock()
+# Bumped by close_all_connections so that every thread drops its closed connections
+_generation = 0
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Open a new connection with the tuned pragmas applied."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+        factory=PooledConnection,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """
+    Return the calling thread's pooled connection to a database, opening it on first use.
+
+    Use it as `with get_connection() as conn:` to commit (or roll back) on exit,
+    like a fresh sqlite3 connection; the connection itself stays open for reuse.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.generation != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+    key = os.path.abspath(db_path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(db_path)
+        with _all_connections_lock:
+            _all_connections.add(conn)
+    return conn
+
+
+def close_all_connections():
+    """Close every pooled connection, e.g. on application shutdown."""
+    global _generation
+    with _all_connections_lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
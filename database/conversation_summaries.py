@@ -0,0 +1,150 @@
+"""
+Summary of every chat conversation for /conversations: first user message, start and
+last update times, theme, provider, model and number of messages.
+
+Triggers on the conversations table keep the summaries up to date in the transaction
+of every message insert, update and delete, so the page reads one page of the
+(last_update, conversation_id) index however many conversations and messages are
+stored. The provider, model and theme are those of the earliest message that has
+them, like the correlated subqueries the page used to run.
+
+Usage:
+    python -m database.conversation_summaries               # rebuild the summaries of DB_PATH
+    python -m database.conversation_summaries questions.db  # rebuild the summaries of another database
+"""
+import sys
+
+from config import DB_PATH
+from database.connection import get_connection
+
+SUMMARY_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS conversation_summaries (
+        conversation_id TEXT PRIMARY KEY,
+        first_message TEXT,
+        start_time DATETIME NOT NULL,
+        last_update DATETIME NOT NULL,
+        theme TEXT,
+        provider TEXT,
+        model TEXT,
+        message_count INTEGER NOT NULL
+    )
+    """,
+    # /conversations lists the most recently updated conversations first, a page at a time
+    "CREATE INDEX IF NOT EXISTS idx_conversation_summaries_last_update "
+    "ON conversation_summaries (last_update, conversation_id)",
+)
+
+# Summary of the conversations matching {where}; every subquery reads idx_conversations_conversation_timestamp
+_SUMMARIZE = """
+    INSERT INTO conversation_summaries
+        (conversation_id, first_message, start_time, last_update, theme, provider, model, message_count)
+    SELECT
+        c.conversation_id,
+        (SELECT message FROM conversations WHERE conversation_id = c.conversation_id AND is_user = 1 ORDER BY timestamp LIMIT 1),
+        MIN(c.timestamp),
+        MAX(c.timestamp),
+        (SELECT theme FROM conversations WHERE conversation_id = c.conversation_id AND theme IS NOT NULL ORDER BY timestamp LIMIT 1),
+        (SELECT provider FROM conversations WHERE conversation_id = c.conversation_id ORDER BY timestamp LIMIT 1),
+        (SELECT model FROM conversations WHERE conversation_id = c.conversation_id ORDER BY timestamp LIMIT 1),
+        COUNT(*)
+    FROM conversations c
+    WHERE {where}
+    GROUP BY c.conversation_id;
+"""
+
+# Trigger name: definition after CREATE TRIGGER <name>
+SUMMARY_TRIGGERS = {
+    # SET expressions see the summary before the update. The chat endpoints insert messages in
+    # order, so the first message and theme are only replaced when the conversation has none;
+    # an older message still takes them over, found with one seek of the conversation index.
+    "conversations_summary_insert": """
+    AFTER INSERT ON conversations
+    BEGIN
+        INSERT INTO conversation_summaries
+            (conversation_id, first_message, start_time, last_update, theme, provider, model, message_count)
+        VALUES (NEW.conversation_id, CASE WHEN NEW.is_user THEN NEW.message END, NEW.timestamp, NEW.timestamp,
+                NEW.theme, NEW.provider, NEW.model, 1)
+        ON CONFLICT (conversation_id) DO UPDATE SET
+            first_message = CASE WHEN NEW.is_user AND (first_message IS NULL OR NEW.timestamp < (
+                                     SELECT timestamp FROM conversations WHERE conversation_id = NEW.conversation_id
+                                     AND is_user = 1 AND id <> NEW.id ORDER BY timestamp LIMIT 1))
+                                 THEN NEW.message ELSE first_message END,
+            theme = CASE WHEN NEW.theme IS NOT NULL AND (theme IS NULL OR NEW.timestamp < (
+                             SELECT timestamp FROM conversations WHERE conversation_id = NEW.conversation_id
+                             AND theme IS NOT NULL AND id <> NEW.id ORDER BY timestamp LIMIT 1))
+                         THEN NEW.theme ELSE theme END,
+            provider = CASE WHEN NEW.timestamp < start_time THEN NEW.provider ELSE provider END,
+            model = CASE WHEN NEW.timestamp < start_time THEN NEW.model ELSE model END,
+            start_time = MIN(start_time, NEW.timestamp),
+            last_update = MAX(last_update, NEW.timestamp),
+            message_count = message_count + 1;
+    END
+    """,
+    # Feedback (helpful) is not summarized; other updates summarize both conversations again
+    "conversations_summary_update": f"""
+    AFTER UPDATE OF conversation_id, timestamp, provider, model, theme, is_user, message ON conversations
+    BEGIN
+        DELETE FROM conversation_summaries WHERE conversation_id IN (OLD.conversation_id, NEW.conversation_id);
+        {_SUMMARIZE.format(where="c.conversation_id IN (OLD.conversation_id, NEW.conversation_id)")}
+    END
+    """,
+    # One index seek per value, not a recount: deleting a whole conversation stays linear
+    "conversations_summary_delete": """
+    AFTER DELETE ON conversations
+    BEGIN
+        DELETE FROM conversation_summaries WHERE conversation_id = OLD.conversation_id AND message_count <= 1;
+        UPDATE conversation_summaries SET
+            first_message = (SELECT message FROM conversations WHERE conversation_id = OLD.conversation_id
+                             AND is_user = 1 ORDER BY timestamp LIMIT 1),
+            start_time = (SELECT MIN(timestamp) FROM conversations WHERE conversation_id = OLD.conversation_id),
+            last_update = (SELECT MAX(timestamp) FROM conversations WHERE conversation_id = OLD.conversation_id),
+            theme = (SELECT theme FROM conversations WHERE conversation_id = OLD.conversation_id
+                     AND theme IS NOT NULL ORDER BY timestamp LIMIT 1),
+            provider = (SELECT provider FROM conversations WHERE conversation_id = OLD.conversation_id ORDER BY timestamp LIMIT 1),
+            model = (SELECT model FROM conversations WHERE conversation_id = OLD.conversation_id ORDER BY timestamp LIMIT 1),
+            message_count = message_count - 1
+        WHERE conversation_id = OLD.conversation_id;
+    END
+    """,
+}
+
+
+def _create_schema(conn):
+    for statement in SUMMARY_SCHEMA:
+        conn.execute(statement)
+    # Recreated every time, so that existing databases pick up changes of the trigger bodies
+    for name, definition in SUMMARY_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {definition}")
+
+
+def create_conversation_summaries(conn):
+    """Create the summary table and triggers, filling the table when it is new."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'conversation_summaries'").fetchone()
+    _create_schema(conn)
+    if not exists:
+        rebuild_conversation_summaries(conn)
+
+
+def rebuild_conversation_summaries(conn):
+    """Summarize every conversation again from the conversations table."""
+    conn.execute("DELETE FROM conversation_summaries")
+    # full scan: every conversation is summarized (read from idx_conversations_conversation_timestamp)
+    conn.execute(_SUMMARIZE.format(where="1"))
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    with get_connection(db_path) as conn:
+        _create_schema(conn)
+        rebuild_conversation_summaries(conn)
+        # full scan: summary of the rebuild
+        conversations, messages = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(message_count), 0) FROM conversation_summaries"
+        ).fetchone()
+    print(f"Rebuilt the conversation summaries of {db_path}: {conversations} conversations, {messages} messages")
+
+
+if __name__ == "__main__":
+    main()
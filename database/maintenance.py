@@ -0,0 +1,49 @@
+import asyncio
+import logging
+
+from config import DB_PATH
+from database.connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Covering indexes of the FastAPI app, created by main.init_db
+INDEXES = (
+    # Chat history and feedback: WHERE conversation_id = ? ORDER BY timestamp.
+    # Also covers the per-conversation MIN/MAX/COUNT aggregates of /conversations.
+    "CREATE INDEX IF NOT EXISTS idx_conversations_conversation_timestamp ON conversations (conversation_id, timestamp)",
+    # /database lists questions newest first, its filters are checked on the index so that
+    # only the questions of the page are read from the table (replaces idx_questions_timestamp)
+    "DROP INDEX IF EXISTS idx_questions_timestamp",
+    "CREATE INDEX IF NOT EXISTS idx_questions_listing ON questions "
+    "(timestamp, theme, subtheme, difficulty, provider, helpful)",
+    # /visualization reads the analytics columns of classified questions without touching the table
+    "CREATE INDEX IF NOT EXISTS idx_questions_theme ON questions "
+    "(theme, subtheme, difficulty, is_error, is_error_msg, helpful, timestamp)",
+    # Startup: ids of the questions to load into the vector index, without reading the embeddings
+    "CREATE INDEX IF NOT EXISTS idx_questions_embedded ON questions (id) WHERE embedding IS NOT NULL",
+    # Startup: embeddings still waiting for the float32 migration (normally none)
+    "CREATE INDEX IF NOT EXISTS idx_questions_text_embedding ON questions (id) WHERE typeof(embedding) = 'text'",
+)
+
+
+def create_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+
+
+def analyze(db_path: str = DB_PATH):
+    """Refresh the planner statistics (sqlite_stat1) of a database."""
+    with get_connection(db_path) as conn:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+    logger.info(f"Analyzed {db_path}")
+
+
+async def run_periodic_analyze(db_path: str = DB_PATH, interval: float = 6 * 3600):
+    """Run ANALYZE on a database every `interval` seconds, until cancelled."""
+    while True:
+        try:
+            await asyncio.to_thread(analyze, db_path)
+        except Exception as e:
+            logger.error(f"ANALYZE of {db_path} failed: {e}")
+        await asyncio.sleep(interval)
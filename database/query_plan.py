@@ -0,0 +1,190 @@
+"""
+Check the query plan of every SQL statement issued by the FastAPI and Flask apps.
+
+The statements are collected from the source: every string literal (or f-string,
+with its placeholders replaced by "?" unless they only use the string constants and
+functions of the module) passed to execute(), executemany(),
+pandas.read_sql_query() or Repository.read()/write(). Each one is run through EXPLAIN QUERY PLAN and the check
+fails if a plan scans a whole table without an index. Statements that are meant
+to read every row are marked with a "# full scan:" comment giving the reason, on
+the line of the call or the line above it.
+
+Usage:
+    python -m database.query_plan               # against a fresh database built by init_db
+    python -m database.query_plan questions.db  # against an existing database and its statistics
+"""
+import ast
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from dataclasses import dataclass
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules of the FastAPI app (main.py) and the Flask app (app.py) that talk to their shared database.
+# The statements of utils/data_aggregation.py read the model_name and metadata columns of the
+# Flask schema, which init_db does not create: they are reported as skipped against a fresh
+# database and only planned against a database that has them.
+SOURCES = (
+    "main.py",
+    "database/repository.py",
+    "database/rollups.py",
+    "database/conversation_summaries.py",
+    "utils/enrichment_queue.py",
+    "utils/embedding_cache.py",
+    "utils/embedding_storage.py",
+    "utils/answer_cache.py",
+    "utils/response_cache.py",
+    "utils/theme_classifier.py",
+    "utils/data_aggregation.py",
+    "routes/database.py",
+    "routes/visualization.py",
+)
+
+EXECUTE_METHODS = {"execute", "executemany", "read_sql_query", "read", "write"}
+SQL_STATEMENT = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+FULL_SCAN_MARKER = "# full scan:"
+# A plan step reading a table row by row: "SCAN questions" (but not "SCAN questions USING INDEX ...")
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+@dataclass
+class Statement:
+    path: str
+    line: int
+    sql: str
+    full_scan_ok: bool
+
+
+def _module_namespace(tree):
+    """The top-level functions and string constants of a module, e.g. helpers building SQL fragments."""
+    nodes = [node for node in tree.body if isinstance(node, ast.FunctionDef) or (
+        isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str))]
+    namespace = {}
+    for node in nodes:
+        try:
+            exec(compile(ast.Module(body=[node], type_ignores=[]), "<sql helpers>", "exec"), namespace)
+        except Exception:
+            # e.g. a default argument using an import; placeholders calling it stay "?"
+            pass
+    return namespace
+
+
+def _placeholder_sql(node, namespace):
+    """The SQL fragment of an f-string placeholder computed from the module namespace, or "?" for a value."""
+    try:
+        value = eval(compile(ast.Expression(node.value), "<placeholder>", "eval"), dict(namespace))
+    except Exception:
+        return "?"
+    return value if isinstance(value, str) and node.conversion == -1 and node.format_spec is None else "?"
+
+
+def _literal_sql(node, namespace):
+    """The SQL of a string or f-string literal, or None for anything else."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(part.value if isinstance(part, ast.Constant) else _placeholder_sql(part, namespace)
+                       for part in node.values)
+    return None
+
+
+def collect_statements(paths=SOURCES, root=ROOT):
+    """Find the SQL statements (SELECT, INSERT, UPDATE, DELETE) executed in some source files."""
+    statements = []
+    for path in paths:
+        with open(os.path.join(root, path), encoding="utf-8") as f:
+            source = f.read()
+        lines = source.splitlines()
+        tree = ast.parse(source)
+        namespace = _module_namespace(tree)
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
+            name = node.func.attr if isinstance(node.func, ast.Attribute) else getattr(node.func, "id", None)
+            if name not in EXECUTE_METHODS:
+                continue
+            literals = [sql for sql in (_literal_sql(arg, namespace) for arg in node.args)
+                        if sql and SQL_STATEMENT.match(sql)]
+            if not literals:
+                continue
+            sql = literals[0]
+            context = lines[max(0, node.lineno - 2):node.lineno]
+            statements.append(Statement(path, node.lineno, " ".join(sql.split()),
+                                        any(FULL_SCAN_MARKER in line for line in context)))
+    return sorted(statements, key=lambda statement: (statement.path, statement.line))
+
+
+def explain(conn, sql):
+    """Plan steps of a statement, with every parameter bound to NULL."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * sql.count("?"))]
+
+
+def full_scans(plan):
+    """Plan steps scanning a whole table (the tiny sqlite_* schema tables do not count)."""
+    return [step for step in plan if (match := FULL_SCAN.match(step)) and not match.group(1).startswith("sqlite_")]
+
+
+def check(conn, statements):
+    """
+    Print the plan of every statement.
+
+    Returns:
+        list: Statements doing an unexpected full table scan
+    """
+    failures = []
+    for statement in statements:
+        try:
+            plan = explain(conn, statement.sql)
+        except sqlite3.OperationalError as e:
+            # e.g. legacy tables the app only touches when they exist
+            print(f"{'skipped':<10}{statement.path}:{statement.line}  {e}")
+            continue
+        if full_scans(plan) and not statement.full_scan_ok:
+            status = "FULL SCAN"
+            failures.append(statement)
+        else:
+            status = "ok"
+        print(f"{status:<10}{statement.path}:{statement.line}  {statement.sql[:100]}")
+        for step in plan:
+            print(f"{'':<12}{step}")
+    return failures
+
+
+def build_schema(db_path):
+    """Create the tables and indexes of the app in a new database."""
+    os.environ["DB_PATH"] = db_path
+    sys.path.insert(0, ROOT)
+    import main as app
+    from utils.answer_cache import AnswerCache
+    from utils.embedding_cache import EmbeddingCache
+    from utils.response_cache import ResponseCache
+
+    app.DB = db_path
+    app.init_db()
+    EmbeddingCache(db_path)._connect()
+    AnswerCache(db_path).load()
+    ResponseCache(db_path)._connect()
+
+
+def main():
+    if len(sys.argv) > 1:
+        conn = sqlite3.connect(sys.argv[1])
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(), "questions.db")
+        build_schema(db_path)
+        conn = sqlite3.connect(db_path)
+
+    failures = check(conn, collect_statements())
+    if failures:
+        print(f"\n{len(failures)} statement(s) scan a whole table:")
+        for statement in failures:
+            print(f"  {statement.path}:{statement.line}  {statement.sql[:100]}")
+        sys.exit(1)
+    print("\nNo unexpected full table scans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import DB_PATH, DB_READER_THREADS
+from database.connection import get_connection
+
+# Keyset of the first page of list_questions: after every stored (timestamp, id)
+FIRST_PAGE = ("9999-12-31", 2 ** 63 - 1)
+
+# Keyset of the first page of list_conversations: after every stored (last_update, conversation_id)
+FIRST_CONVERSATIONS_PAGE = ("9999-12-31", "")
+
+
+class Repository:
+    """
+    Async access to the questions and conversations tables of the FastAPI app.
+
+    Writes run one at a time on a dedicated writer thread, so they never queue on each
+    other's locks; reads run on a pool of reader threads, which WAL lets proceed while
+    the writer commits. Every thread uses its own pooled connection and every call is
+    one transaction.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, readers: int = DB_READER_THREADS):
+        self.db_path = db_path
+        self.readers = readers
+        self._writer = None
+        self._reader_pool = None
+
+    def _call(self, func, *args):
+        with get_connection(self.db_path) as conn:
+            return func(conn, *args)
+
+    async def read(self, func, *args):
+        """Run func(conn, *args) on a reader thread."""
+        if self._reader_pool is None:
+            self._reader_pool = ThreadPoolExecutor(self.readers, thread_name_prefix="db-reader")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader_pool, functools.partial(self._call, func, *args))
+
+    async def write(self, func, *args):
+        """Run func(conn, *args) on the writer thread and commit."""
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(1, thread_name_prefix="db-writer")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, functools.partial(self._call, func, *args))
+
+    def close(self):
+        """Wait for the queued queries and stop the threads (they are recreated on next use)."""
+        for pool in (self._writer, self._reader_pool):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._writer = self._reader_pool = None
+
+    # Questions
+
+    async def insert_question(self, question, timestamp, provider, model, embedding, embedding_dim,
+                              embedding_model, on_insert=None):
+        """
+        Store a new question.
+
+        Args:
+            embedding: Packed float32 embedding (see utils.embedding_storage)
+            on_insert: Optional callable(conn, question_id) run in the same transaction,
+                e.g. to enqueue the enrichment of the question
+
+        Returns:
+            int: Id of the new question
+        """
+        return await self.write(_insert_question, question, timestamp, provider, model, embedding,
+                                embedding_dim, embedding_model, on_insert)
+
+    async def fetch_question(self, question_id):
+        """(question, embedding) of a question, or None."""
+        return await self.read(_fetch_one, "SELECT question, embedding FROM questions WHERE id = ?", (question_id,))
+
+    async def fetch_questions(self, question_ids):
+        """(id, question, timestamp) rows of some questions, in no particular order."""
+        if not question_ids:
+            return []
+        return await self.read(
+            _fetch_all,
+            f"SELECT id, question, timestamp FROM questions WHERE id IN ({','.join('?' * len(question_ids))})",
+            tuple(question_ids)
+        )
+
+    async def list_questions(self, before=None, limit=50, theme=None, subtheme=None, difficulty=None, provider=None,
+                             helpful=None):
+        """
+        One page of questions, newest first, without their embeddings.
+
+        Args:
+            before: (timestamp, id) of the last question of the previous page, None for the first page
+            limit: Maximum number of questions
+            theme, subtheme, difficulty, provider: Optional values to filter on
+            helpful: Optional feedback to filter on: 1, 0, or "none" for questions without feedback
+
+        Returns:
+            list: (id, question, timestamp, theme, subtheme, provider, model, is_error, difficulty, is_error_msg, helpful) rows
+        """
+        timestamp, question_id = before or FIRST_PAGE
+        feedback = None if helpful == "none" else helpful
+        # (timestamp, id) < (?, ?) seeks into idx_questions_listing, whatever the page
+        return await self.read(
+            _fetch_all,
+            "SELECT id, question, timestamp, theme, subtheme, provider, model, is_error, difficulty, is_error_msg, helpful "
+            "FROM questions WHERE (timestamp, id) < (?, ?) "
+            "AND (? IS NULL OR theme = ?) AND (? IS NULL OR subtheme = ?) AND (? IS NULL OR difficulty = ?) "
+            "AND (? IS NULL OR provider = ?) AND (? = 0 OR helpful IS ?) "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (timestamp, question_id, theme, theme, subtheme, subtheme, difficulty, difficulty, provider, provider,
+             helpful is not None, feedback, limit)
+        )
+
+    async def count_questions(self):
+        # full scan: counts every question (read from the smallest index)
+        row = await self.read(_fetch_one, "SELECT COUNT(*) FROM questions", ())
+        return row[0]
+
+    async def fetch_question_rollups(self, start=None, end=None, theme=None):
+        """
+        DataFrame of the question counts per day, theme, subtheme, difficulty, error flag and feedback (database.rollups).
+
+        Args:
+            start: Optional first day (ISO date) to count
+            end: Optional last day (ISO date) to count
+            theme: Optional theme to count
+        """
+        return await self.read(_read_question_rollups, start, end, theme)
+
+    async def fetch_rollup_version(self):
+        """Counter bumped by every change of the question rollups."""
+        # full scan: the version table has a single row
+        row = await self.read(_fetch_one, "SELECT version FROM question_rollups_version", ())
+        return row[0] if row else 0
+
+    async def embedded_question_ids(self):
+        return await self.read(_fetch_column, "SELECT id FROM questions WHERE embedding IS NOT NULL", ())
+
+    async def fetch_embeddings(self, question_ids):
+        """(id, embedding) rows of some questions."""
+        return await self.read(
+            _fetch_all,
+            f"SELECT id, embedding FROM questions WHERE id IN ({','.join('?' * len(question_ids))})",
+            tuple(question_ids)
+        )
+
+    async def update_question_analysis(self, question_id, analysis):
+        """Store the result of utils.enrichment.classify_question."""
+        await self.write(
+            _execute,
+            "UPDATE questions SET theme = ?, subtheme = ?, theme_source = ?, is_error = ?, difficulty = ?, is_error_msg = ? WHERE id = ?",
+            (analysis["theme"], analysis["subtheme"], analysis.get("theme_source", "llm"), analysis["is_error_msg"],
+             analysis["difficulty"], analysis["is_error_msg"], question_id)
+        )
+
+    async def update_question_embedding(self, question_id, embedding, embedding_dim, embedding_model):
+        await self.write(
+            _execute,
+            "UPDATE questions SET embedding = ?, embedding_dim = ?, embedding_model = ? WHERE id = ?",
+            (embedding, embedding_dim, embedding_model, question_id)
+        )
+
+    async def update_question_feedback(self, question_id, helpful):
+        await self.write(_execute, "UPDATE questions SET helpful = ? WHERE id = ?", (helpful, question_id))
+
+    async def delete_question(self, question_id):
+        await self.write(_execute, "DELETE FROM questions WHERE id = ?", (question_id,))
+
+    async def clear_questions(self):
+        # full scan: every row goes through the rollup trigger (database.rollups)
+        await self.write(_execute, "DELETE FROM questions", ())
+
+    # Conversations
+
+    async def insert_message(self, conversation_id, timestamp, provider, model, is_user, message, theme=None,
+                             html=None, html_version=None):
+        """
+        Store a chat message.
+
+        Args:
+            html: Optional rendered HTML of the message, displayed instead of the markdown
+            html_version: Version of the renderer of html (main.RENDERER_VERSION)
+
+        Returns:
+            int: Id of the new message
+        """
+        return await self.write(
+            _insert,
+            "INSERT INTO conversations (conversation_id, timestamp, provider, model, theme, is_user, message, html, html_version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (conversation_id, timestamp, provider, model, theme, is_user, message, html, html_version)
+        )
+
+    async def fetch_messages_since(self, conversation_id, after_id, before_id=None):
+        """(id, is_user, message) rows of a conversation after a message id (and before another one), oldest first."""
+        # The ids are filtered on idx_conversations_conversation_timestamp, which holds them
+        return await self.read(
+            _fetch_all,
+            "SELECT id, is_user, message FROM conversations WHERE conversation_id = ? AND id > ? "
+            "AND (? IS NULL OR id < ?) ORDER BY timestamp",
+            (conversation_id, after_id, before_id, before_id)
+        )
+
+    async def fetch_history_summary(self, conversation_id):
+        """(summary, id of the last message it covers) of a conversation (utils.chat_history), or None."""
+        return await self.read(
+            _fetch_one,
+            "SELECT summary, summarized_until FROM chat_history_summaries WHERE conversation_id = ?",
+            (conversation_id,)
+        )
+
+    async def save_history_summary(self, conversation_id, summary, summarized_until, updated_at):
+        await self.write(
+            _execute,
+            "INSERT INTO chat_history_summaries (conversation_id, summary, summarized_until, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (conversation_id) DO UPDATE SET summary = excluded.summary, "
+            "summarized_until = excluded.summarized_until, updated_at = excluded.updated_at",
+            (conversation_id, summary, summarized_until, updated_at)
+        )
+
+    async def fetch_chat_messages(self, conversation_id):
+        """(id, is_user, message, timestamp, html, html_version) rows of a conversation, oldest first."""
+        return await self.read(
+            _fetch_all,
+            "SELECT id, is_user, message, timestamp, html, html_version FROM conversations "
+            "WHERE conversation_id = ? ORDER BY timestamp",
+            (conversation_id,)
+        )
+
+    async def update_message_html(self, rows):
+        """Store the HTML of chat messages rendered again, from (html, html_version, id) rows."""
+        await self.write(_execute_many, "UPDATE conversations SET html = ?, html_version = ? WHERE id = ?", rows)
+
+    async def count_messages(self, conversation_id):
+        """Number of stored messages of a conversation (kept by the database.conversation_summaries triggers)."""
+        row = await self.read(
+            _fetch_one,
+            "SELECT message_count FROM conversation_summaries WHERE conversation_id = ?",
+            (conversation_id,)
+        )
+        return row[0] if row else 0
+
+    async def fetch_conversation_theme(self, conversation_id):
+        row = await self.read(
+            _fetch_one,
+            "SELECT theme FROM conversations WHERE conversation_id = ? AND theme IS NOT NULL LIMIT 1",
+            (conversation_id,)
+        )
+        return row[0] if row else None
+
+    async def update_feedback(self, conversation_id, message_timestamp, helpful):
+        """Record whether a chat message was helpful."""
+        await self.write(
+            _execute,
+            "UPDATE conversations SET helpful = ? WHERE conversation_id = ? AND timestamp = ?",
+            (helpful, conversation_id, message_timestamp)
+        )
+
+    async def list_conversations(self, before=None, limit=50):
+        """
+        One page of conversations, most recently updated first (database.conversation_summaries).
+
+        Args:
+            before: (last_update, conversation_id) of the last conversation of the previous page, None for the first page
+            limit: Maximum number of conversations
+
+        Returns:
+            list: (conversation_id, first_message, start_time, last_update, theme, provider, model, message_count) rows
+        """
+        last_update, conversation_id = before or FIRST_CONVERSATIONS_PAGE
+        # (last_update, conversation_id) < (?, ?) seeks into idx_conversation_summaries_last_update
+        return await self.read(
+            _fetch_all,
+            "SELECT conversation_id, first_message, start_time, last_update, theme, provider, model, message_count "
+            "FROM conversation_summaries WHERE (last_update, conversation_id) < (?, ?) "
+            "ORDER BY last_update DESC, conversation_id DESC LIMIT ?",
+            (last_update, conversation_id, limit)
+        )
+
+    async def delete_conversation(self, conversation_id):
+        await self.write(_delete_conversation, conversation_id)
+
+    async def clear_conversations(self):
+        await self.write(_clear_conversations)
+
+
+def _execute(conn, sql, params):
+    conn.execute(sql, params)
+
+
+def _insert(conn, sql, params):
+    return conn.execute(sql, params).lastrowid
+
+
+def _execute_many(conn, sql, rows):
+    conn.executemany(sql, rows)
+
+
+def _fetch_one(conn, sql, params):
+    return conn.execute(sql, params).fetchone()
+
+
+def _fetch_all(conn, sql, params):
+    return conn.execute(sql, params).fetchall()
+
+
+def _fetch_column(conn, sql, params):
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def _read_question_rollups(conn, start, end, theme):
+    # full scan: the rollup holds a few rows per day
+    return pd.read_sql_query(
+        "SELECT day, theme, subtheme, difficulty, is_error_msg, helpful, count FROM question_rollups "
+        "WHERE (? IS NULL OR day >= ?) AND (? IS NULL OR day <= ?) AND (? IS NULL OR theme = ?)",
+        conn,
+        params=(start, start, end, end, theme, theme)
+    )
+
+
+def _insert_question(conn, question, timestamp, provider, model, embedding, embedding_dim, embedding_model, on_insert):
+    cursor = conn.execute(
+        "INSERT INTO questions (question, timestamp, provider, model, helpful, embedding, embedding_dim, embedding_model) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (question, timestamp, provider, model, None, embedding, embedding_dim, embedding_model)
+    )
+    question_id = cursor.lastrowid
+    if on_insert is not None:
+        on_insert(conn, question_id)
+    return question_id
+
+
+def _delete_conversation(conn, conversation_id):
+    conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+    conn.execute("DELETE FROM chat_history_summaries WHERE conversation_id = ?", (conversation_id,))
+
+
+def _clear_conversations(conn):
+    # full scan: every row goes through the summary trigger (database.conversation_summaries)
+    conn.execute("DELETE FROM conversations")
+    conn.execute("DELETE FROM chat_history_summaries")
@@ -0,0 +1,134 @@
+"""
+Rollup of the classified questions for /visualization: one row per day, theme,
+subtheme, difficulty, error flag and feedback, with the number of questions.
+
+Triggers on the questions table keep the rollup up to date in the transaction of
+every insert, classification, feedback update and delete, so the page reads a few
+hundred aggregate rows however many questions are stored. Questions without a theme
+are not counted. Every change of the rollup also bumps the single row of
+question_rollups_version, which tells the page cache of main.py when to render again.
+
+Usage:
+    python -m database.rollups               # rebuild the rollup of DB_PATH
+    python -m database.rollups questions.db  # rebuild the rollup of another database
+"""
+import sys
+
+from config import DB_PATH
+from database.connection import get_connection
+
+# Dimensions of the rollup, in the order of its key index
+DIMENSIONS = ("day", "theme", "subtheme", "difficulty", "is_error_msg", "helpful")
+
+# Rollup row of a question row (NEW or OLD in a trigger); NULL dimensions are compared with IS
+_MATCH = (
+    "day IS date({row}.timestamp) AND theme = {row}.theme AND subtheme IS {row}.subtheme "
+    "AND difficulty IS {row}.difficulty AND is_error_msg IS {row}.is_error_msg AND helpful IS {row}.helpful"
+)
+
+# changes() is the row count of the UPDATE just before: insert the row if it did not exist yet
+_ADD = """
+    UPDATE question_rollups SET count = count + 1 WHERE {match};
+    INSERT INTO question_rollups (day, theme, subtheme, difficulty, is_error_msg, helpful, count)
+    SELECT date({row}.timestamp), {row}.theme, {row}.subtheme, {row}.difficulty, {row}.is_error_msg, {row}.helpful, 1
+    WHERE changes() = 0 AND {row}.theme IS NOT NULL;
+"""
+
+_REMOVE = """
+    UPDATE question_rollups SET count = count - 1 WHERE {match};
+    DELETE FROM question_rollups WHERE {match} AND count <= 0;
+"""
+
+_BUMP_VERSION = "UPDATE question_rollups_version SET version = version + 1;"
+
+
+def _add(row):
+    return _ADD.format(match=_MATCH.format(row=row), row=row)
+
+
+def _remove(row):
+    return _REMOVE.format(match=_MATCH.format(row=row))
+
+
+ROLLUP_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS question_rollups (
+        day TEXT,
+        theme TEXT NOT NULL,
+        subtheme TEXT,
+        difficulty TEXT,
+        is_error_msg BOOLEAN,
+        helpful INTEGER,
+        count INTEGER NOT NULL
+    )
+    """,
+    # Lookup of the row to increment or decrement by the triggers
+    f"CREATE INDEX IF NOT EXISTS idx_question_rollups_key ON question_rollups ({', '.join(DIMENSIONS)})",
+    "CREATE TABLE IF NOT EXISTS question_rollups_version (version INTEGER NOT NULL)",
+)
+
+# Trigger name: definition after CREATE TRIGGER <name>
+ROLLUP_TRIGGERS = {
+    "questions_rollup_insert": f"""
+    AFTER INSERT ON questions
+    WHEN NEW.theme IS NOT NULL
+    BEGIN {_add("NEW")} {_BUMP_VERSION} END
+    """,
+    "questions_rollup_update": f"""
+    AFTER UPDATE OF timestamp, theme, subtheme, difficulty, is_error_msg, helpful ON questions
+    WHEN OLD.timestamp IS NOT NEW.timestamp OR OLD.theme IS NOT NEW.theme OR OLD.subtheme IS NOT NEW.subtheme
+        OR OLD.difficulty IS NOT NEW.difficulty OR OLD.is_error_msg IS NOT NEW.is_error_msg OR OLD.helpful IS NOT NEW.helpful
+    BEGIN {_remove("OLD")} {_add("NEW")} {_BUMP_VERSION} END
+    """,
+    "questions_rollup_delete": f"""
+    AFTER DELETE ON questions
+    WHEN OLD.theme IS NOT NULL
+    BEGIN {_remove("OLD")} {_BUMP_VERSION} END
+    """,
+}
+
+
+def _create_schema(conn):
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+    # full scan: the version table has a single row
+    conn.execute("INSERT INTO question_rollups_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM question_rollups_version)")
+    # Recreated every time, so that existing databases pick up changes of the trigger bodies
+    for name, definition in ROLLUP_TRIGGERS.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {definition}")
+
+
+def create_rollups(conn):
+    """Create the rollup tables and triggers, filling the rollup when it is new."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'question_rollups'").fetchone()
+    _create_schema(conn)
+    if not exists:
+        rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn):
+    """Recount the rollup from the questions table."""
+    conn.execute("DELETE FROM question_rollups")
+    # full scan: the rollup counts every classified question (read from idx_questions_theme)
+    conn.execute(
+        "INSERT INTO question_rollups (day, theme, subtheme, difficulty, is_error_msg, helpful, count) "
+        "SELECT date(timestamp), theme, subtheme, difficulty, is_error_msg, helpful, COUNT(*) FROM questions "
+        "WHERE theme IS NOT NULL GROUP BY date(timestamp), theme, subtheme, difficulty, is_error_msg, helpful"
+    )
+    # full scan: the version table has a single row
+    conn.execute(_BUMP_VERSION)
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    with get_connection(db_path) as conn:
+        _create_schema(conn)
+        rebuild_rollups(conn)
+        # full scan: summary of the rebuilt rollup
+        rows, questions = conn.execute("SELECT COUNT(*), COALESCE(SUM(count), 0) FROM question_rollups").fetchone()
+    print(f"Rebuilt the rollup of {db_path}: {rows} rows for {questions} classified questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,192 @@
+import copy
+import json
 from abc import ABC, abstractmethod
+from typing import Optional
+
+from config import DICT_CATEGORIES
+from utils.enrichment import run_blocking, iterate_blocking
+
+DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
+
+
+def build_analysis_prompt(question: str, categories: dict = DICT_CATEGORIES) -> str:
+    """Build the prompt asking for theme, subtheme, error flag and difficulty in a single JSON object."""
+    return f"""Analyze the following question or error message and return a JSON object with exactly these keys:
+    - "theme": exactly one of the categories listed below
+    - "subtheme": exactly one of the subcategories listed for the chosen theme
+    - "is_error": true if the text contains an error message (stack traces, error codes, exception details or explicit error statements), false if it is a regular question
+    - "difficulty": "beginner" (basic syntax, simple concepts, common errors), "intermediate" (multiple concepts, framework-specific issues) or "advanced" (complex algorithms, system design, performance optimization, deep technical knowledge)
+
+    Categories and their subcategories: {json.dumps(categories)}
+
+    Only respond with the JSON object, nothing else.
+
+    Question/Error: {question}"""
+
+
+def parse_question_analysis(content: str, categories: dict = DICT_CATEGORIES) -> Optional[dict]:
+    """
+    Parse and validate the JSON answer to the analysis prompt.
+
+    Args:
+        content: Raw model output
+        categories: Mapping of themes to their subthemes
+
+    Returns:
+        dict with theme, subtheme, is_error_msg and difficulty, or None if the output is unusable
+    """
+    try:
+        start_idx = content.find('{')
+        end_idx = content.rfind('}') + 1
+        data = json.loads(content[start_idx:end_idx])
+    except (AttributeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    # Match labels case-insensitively but always return the canonical spelling from the config
+    themes = {theme.lower(): theme for theme in categories}
+    theme = themes.get(str(data.get("theme", "")).strip().lower())
+    if theme is None:
+        return None
+
+    subthemes = {subtheme.lower(): subtheme for subtheme in categories[theme]}
+    subtheme = subthemes.get(str(data.get("subtheme", "")).strip().lower(), "other")
+
+    is_error = data.get("is_error")
+    if isinstance(is_error, str):
+        is_error = is_error.strip().lower() in ("true", "error", "yes")
+
+    difficulty = str(data.get("difficulty", "")).strip().lower()
+    if difficulty not in DIFFICULTY_LEVELS:
+        difficulty = "intermediate"
+
+    return {
+        "theme": theme,
+        "subtheme": subtheme,
+        "is_error_msg": bool(is_error),
+        "difficulty": difficulty,
+    }
+
+
+CHAT_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+
+def build_chat_messages(message: str, history: Optional[list] = None) -> list:
+    """Messages of a chat request: system prompt, previous turns ({"role", "content"} dicts) and the new message."""
+    messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+    if history:
+        messages.extend(history)
+    messages.append({"role": "user", "content": message})
+    return messages
+
 
 class LLMProvider(ABC):
-    
+
+    # Name of the provider in the cache keys
+    name = None
+    # Optional utils.response_cache.ResponseCache used by complete()
+    response_cache = None
+
     @abstractmethod
     def get_response(self, prompt: str) -> str:
         pass
 
-    
+    def _complete(self, model, messages, temperature=None, max_tokens=None, **options) -> str:
+        """Send a non-streamed chat request and return the content of the reply."""
+        raise NotImplementedError
+
+    async def _acomplete(self, model, messages, temperature=None, max_tokens=None, **options) -> str:
+        return await run_blocking(self._complete, model, messages, temperature, max_tokens, **options)
+
+    def _response_cache_key(self, cache, model, messages, temperature, max_tokens, options):
+        if not cache or self.response_cache is None:
+            return None
+        return self.response_cache.make_key(self.name or type(self).__name__, model, messages,
+                                            temperature, max_tokens, **options)
+
+    def complete(self, messages: list, model=None, temperature=None, max_tokens=None, cache=True, **options) -> str:
+        """
+        Get the reply to a list of chat messages, from the response cache if one is attached.
+
+        Args:
+            messages: {"role", "content"} dicts
+            cache: False to bypass the response cache for this call
+            **options: Other request options of the provider (part of the cache key)
+        """
+        model = model or self.default_model
+        key = self._response_cache_key(cache, model, messages, temperature, max_tokens, options)
+        if key is not None:
+            response = self.response_cache.get(key)
+            if response is not None:
+                return response
+        response = self._complete(model, messages, temperature, max_tokens, **options)
+        if key is not None:
+            self.response_cache.put(key, self.name or type(self).__name__, model, response)
+        return response
+
+    async def acomplete(self, messages: list, model=None, temperature=None, max_tokens=None, cache=True, **options) -> str:
+        model = model or self.default_model
+        key = self._response_cache_key(cache, model, messages, temperature, max_tokens, options)
+        if key is not None:
+            response = await run_blocking(self.response_cache.get, key)
+            if response is not None:
+                return response
+        response = await self._acomplete(model, messages, temperature, max_tokens, **options)
+        if key is not None:
+            await run_blocking(self.response_cache.put, key, self.name or type(self).__name__, model, response)
+        return response
+
+    def uncached(self):
+        """This provider without its response cache, e.g. provider.uncached().analyze_question(text) to force a fresh call."""
+        provider = copy.copy(self)
+        provider.response_cache = None
+        return provider
+
+    def stream_response(self, prompt: str, model=None):
+        """Yield the answer to a prompt piece by piece. Providers that cannot stream yield it whole."""
+        yield self.get_response(prompt, model=model)
+
+    def stream_chat_response(self, message, history=None, model=None):
+        """Yield a chat reply piece by piece. Providers that cannot stream yield it whole."""
+        yield self.get_chat_response(message, history, model=model)
+
+    # Async variants used by the FastAPI app. Providers without an async HTTP client
+    # run the blocking methods in worker threads.
+
+    async def aget_response(self, prompt: str, model=None) -> str:
+        return await run_blocking(self.get_response, prompt, model=model)
+
+    async def astream_response(self, prompt: str, model=None):
+        async for token in iterate_blocking(self.stream_response, prompt, model=model):
+            yield token
+
+    async def aget_chat_response(self, message, history=None, model=None) -> str:
+        return await run_blocking(self.get_chat_response, message, history, model=model)
+
+    async def astream_chat_response(self, message, history=None, model=None):
+        async for token in iterate_blocking(self.stream_chat_response, message, history, model=model):
+            yield token
+
+    async def aclassify_theme(self, question: str, categories, model=None) -> str:
+        return await run_blocking(self.classify_theme, question, categories, model=model)
+
+    async def aanalyze_question(self, question: str, model=None, categories: dict = DICT_CATEGORIES) -> dict:
+        return await run_blocking(self.analyze_question, question, model=model, categories=categories)
+
+    def close(self):
+        """Release the HTTP connections of the provider."""
+
+    async def aclose(self):
+        """Release the connections of the async HTTP client."""
+
+    def analyze_question_separately(self, question: str, model=None, categories: dict = DICT_CATEGORIES) -> dict:
+        """Fallback analysis using one classifier call per field."""
+        theme = self.classify_theme(question, list(categories), model=model)
+        return {
+            "theme": theme,
+            "subtheme": self.classify_subtheme(question, theme, categories.get(theme, []), model=model),
+            "is_error_msg": self.is_error_message(question, model=model),
+            "difficulty": self.judge_difficulty_level(question, model=model),
+        }
+
@@ -1,13 +1,58 @@
 import requests
+import httpx
+import json
 import logging
 import os
-from .base import LLMProvider
+from requests.adapters import HTTPAdapter
+from .base import LLMProvider, build_analysis_prompt, build_chat_messages, parse_question_analysis
+from config import DICT_CATEGORIES, OLLAMA_BASE_URL, OLLAMA_POOL_SIZE, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_KEEPALIVE_EXPIRY
+from utils.embedding_cache import embedding_cache
+from utils.error_detection import detect_error_message
+from utils.enrichment import run_blocking
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter applying a default timeout to the requests that do not set one."""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
 
 class OllamaProvider(LLMProvider):
 
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    name = "ollama"
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, pool_size: int = OLLAMA_POOL_SIZE,
+                 connect_timeout: float = OLLAMA_CONNECT_TIMEOUT, read_timeout: float = OLLAMA_READ_TIMEOUT,
+                 keepalive_expiry: float = OLLAMA_KEEPALIVE_EXPIRY):
+        """
+        Args:
+            base_url: URL of the Ollama server
+            pool_size: Maximum number of connections kept open to the server
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for the next bytes of a response
+            keepalive_expiry: Seconds an idle connection of the async client stays open
+        """
 
         self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.keepalive_expiry = keepalive_expiry
+
+        # Keep-alive connections reused by every call, instead of a new TCP connection per request
+        self.session = requests.Session()
+        adapter = TimeoutHTTPAdapter(self.timeout, pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Created on first use, inside the event loop of the app
+        self._async_client = None
+
         self.models = {
             "gemma3:1b": "gemma3:1b",
             "deepseek-r1:latest": "deepseek-r1:latest", #TODO this version is 7B for deepseek, find a way to display the more informative and readable name instead.
@@ -36,6 +81,30 @@ class OllamaProvider(LLMProvider):
         
         self.logger.info(f"Initialized OllamaProvider with base URL: {base_url}")
     
+    @property
+    def async_client(self):
+        """Pooled httpx client used by the async methods."""
+        if self._async_client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+            )
+        return self._async_client
+
+    def close(self):
+        self.session.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
     def get_available_models(self):
         self.logger.debug("Getting available models")
         return self.models
@@ -48,10 +117,13 @@ class OllamaProvider(LLMProvider):
         self.logger.info(f"Getting response using model: {model}, stream={stream}")
         self.logger.info(f"Prompt: {prompt[:50]}...")
 
+        if stream:
+            return "".join(self.stream_response(prompt, model=model))
+
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/generate",
-                json={"model": model, "prompt": prompt, "stream": stream}
+                json={"model": model, "prompt": prompt, "stream": False}
             )
             self.logger.info(f"ollama response.json() = {response.json()}")
             response_json = response.json()["response"]
@@ -61,41 +133,178 @@ class OllamaProvider(LLMProvider):
             self.logger.error(f"Error in get_response: {str(e)}")
             raise
 
+    @staticmethod
+    def _chat_request(model, messages, temperature=None, max_tokens=None, **options):
+        """Body of a non-streamed /api/chat request; options such as format go at the top level."""
+        model_options = {}
+        if temperature is not None:
+            model_options["temperature"] = temperature
+        if max_tokens is not None:
+            model_options["num_predict"] = max_tokens
+        return {"model": model, "messages": messages, "stream": False, "options": model_options, **options}
+
+    def _complete(self, model, messages, temperature=None, max_tokens=None, **options) -> str:
+        response = self.session.post(
+            f"{self.base_url}/api/chat",
+            json=self._chat_request(model, messages, temperature, max_tokens, **options)
+        )
+        return self._decode_chunk(response.content)["message"]["content"]
+
+    async def _acomplete(self, model, messages, temperature=None, max_tokens=None, **options) -> str:
+        response = await self.async_client.post(
+            "/api/chat",
+            json=self._chat_request(model, messages, temperature, max_tokens, **options)
+        )
+        return self._decode_chunk(response.content)["message"]["content"]
+
+    @staticmethod
+    def _decode_chunk(line):
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise RuntimeError(chunk["error"])
+        return chunk
+
+    @classmethod
+    def _iter_ndjson(cls, response):
+        """Decode a streamed Ollama response line by line as it arrives."""
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = cls._decode_chunk(line)
+            yield chunk
+            if chunk.get("done"):
+                break
+
+    @classmethod
+    async def _aiter_ndjson(cls, response):
+        """Async version of _iter_ndjson for httpx streamed responses."""
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = cls._decode_chunk(line)
+            yield chunk
+            if chunk.get("done"):
+                break
+
+    async def aget_response(self, prompt: str, model=None) -> str:
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Getting async response using model: {model}")
+        
+        try:
+            response = await self.async_client.post(
+                "/api/generate",
+                json={"model": model, "prompt": prompt, "stream": False}
+            )
+            response.raise_for_status()
+            return response.json()["response"]
+        except Exception as e:
+            self.logger.error(f"Error in aget_response: {str(e)}")
+            raise
+
+    async def astream_response(self, prompt: str, model=None):
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Streaming async response using model: {model}")
+        
+        try:
+            async with self.async_client.stream(
+                "POST",
+                "/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True}
+            ) as response:
+                async for chunk in self._aiter_ndjson(response):
+                    if chunk.get("response"):
+                        yield chunk["response"]
+        except Exception as e:
+            self.logger.error(f"Error in astream_response: {str(e)}")
+            raise
+
+    def stream_response(self, prompt: str, model=None):
+        """Yield the answer to a prompt token by token, as Ollama generates it."""
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Streaming response using model: {model}")
+        self.logger.info(f"Prompt: {prompt[:50]}...")
+        
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True},
+                stream=True
+            ) as response:
+                for chunk in self._iter_ndjson(response):
+                    if chunk.get("response"):
+                        yield chunk["response"]
+            self.logger.debug("Streamed response received from Ollama API")
+        except Exception as e:
+            self.logger.error(f"Error in stream_response: {str(e)}")
+            raise
+
     def get_chat_response(self, message, history=None, model=None):
         """Get a response in a multi-turn conversation."""
+        return "".join(self.stream_chat_response(message, history, model=model))
+
+    def stream_chat_response(self, message, history=None, model=None):
+        """Yield the reply in a multi-turn conversation token by token."""
         if not model:
             model = self.default_model
             
         self.logger.info(f"Getting chat response using model: {model}")
         self.logger.debug(f"Message: {message[:50]}...")
+        if history:
+            self.logger.debug(f"Added {len(history)} messages from history")
         
         try:
-            # Format messages for Ollama chat API
-            messages = [{"role": "system", "content": "You are a helpful AI assistant."}]
-            
-            # Add conversation history if provided
-            if history and len(history) > 0:
-                messages.extend(history)
-                self.logger.debug(f"Added {len(history)} messages from history")
-            
-            # Add the new user message
-            messages.append({"role": "user", "content": message})
-            
-            # Get response from Ollama
-            response = requests.post(
+            with self.session.post(
                 f"{self.base_url}/api/chat",
                 json={
                     "model": model,
-                    "messages": messages
-                }
-            )
-            
-            content = response.json()['message']['content']
+                    "messages": build_chat_messages(message, history),
+                    "stream": True
+                },
+                stream=True
+            ) as response:
+                for chunk in self._iter_ndjson(response):
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
             self.logger.debug("Chat response received from Ollama API")
-            return content
         except Exception as e:
             self.logger.error(f"Error in get_chat_response: {str(e)}")
-            return f"Error: {str(e)}"    
+            yield f"Error: {str(e)}"
+
+    async def aget_chat_response(self, message, history=None, model=None):
+        return "".join([token async for token in self.astream_chat_response(message, history, model=model)])
+
+    async def astream_chat_response(self, message, history=None, model=None):
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Getting async chat response using model: {model}")
+        
+        try:
+            async with self.async_client.stream(
+                "POST",
+                "/api/chat",
+                json={
+                    "model": model,
+                    "messages": build_chat_messages(message, history),
+                    "stream": True
+                }
+            ) as response:
+                async for chunk in self._aiter_ndjson(response):
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
+        except Exception as e:
+            self.logger.error(f"Error in astream_chat_response: {str(e)}")
+            yield f"Error: {str(e)}"
     
 
     def classify_theme(self, question: str, categories: list, model=None) -> str:
@@ -111,21 +320,16 @@ class OllamaProvider(LLMProvider):
         Question: {question}"""
         
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are a classifier that categorizes questions."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "options": {
-                        "temperature": 0.3
-                    }
-                }
+            response = self.complete(
+                [
+                    {"role": "system", "content": "You are a classifier that categorizes questions."},
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                temperature=0.3
             )
             
-            theme = response.json()['message']['content'].strip().lower()
+            theme = response.strip().lower()
             # Ensure the theme is one of the valid categories
             if theme not in categories:
                 theme = "other"
@@ -156,21 +360,16 @@ class OllamaProvider(LLMProvider):
         Question: {question}"""
         
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are a classifier that categorizes questions into subcategories."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "options": {
-                        "temperature": 0.3
-                    }
-                }
+            response = self.complete(
+                [
+                    {"role": "system", "content": "You are a classifier that categorizes questions into subcategories."},
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                temperature=0.3
             )
             
-            subtheme = response.json()['message']['content'].strip().lower()
+            subtheme = response.strip().lower()
             # Ensure the subtheme is one of the valid subcategories
             if subtheme not in theme_subcategories:
                 subtheme = "other"
@@ -211,21 +410,16 @@ class OllamaProvider(LLMProvider):
         Question/Error: {question}"""
         
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "system", "content": "You are an expert at evaluating the difficulty level of programming questions."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "options": {
-                        "temperature": 0.3
-                    }
-                }
+            response = self.complete(
+                [
+                    {"role": "system", "content": "You are an expert at evaluating the difficulty level of programming questions."},
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                temperature=0.3
             )
             
-            difficulty = response.json()['message']['content'].strip().lower()
+            difficulty = response.strip().lower()
             # Ensure the response is one of the valid difficulty levels
             if difficulty not in ["beginner", "intermediate", "advanced"]:
                 self.logger.warning(f"Invalid difficulty '{difficulty}', defaulting to 'intermediate'")
@@ -249,6 +443,11 @@ class OllamaProvider(LLMProvider):
         Returns:
             bool: True if the prompt appears to be an error message, False otherwise
         """
+        # Clear cases are decided by rules, only ambiguous text goes to the model
+        detected = detect_error_message(prompt)
+        if detected is not None:
+            return detected
+        
         if not model:
             model = self.default_model
             
@@ -263,20 +462,15 @@ class OllamaProvider(LLMProvider):
         Text: {prompt}"""
         
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json={
-                    "model": model,
-                    "messages": [
-                        {"role": "user", "content": analysis_prompt}
-                    ],
-                    "options": {
-                        "temperature": 0.1
-                    }
-                }
+            response = self.complete(
+                [
+                    {"role": "user", "content": analysis_prompt}
+                ],
+                model=model,
+                temperature=0.1
             )
             
-            result = response.json()['message']['content'].strip().lower()
+            result = response.strip().lower()
             is_error = result == "error"
             self.logger.debug(f"Classification result: {'error message' if is_error else 'regular question'}")
             return is_error
@@ -286,6 +480,65 @@ class OllamaProvider(LLMProvider):
             # Default to assuming it's a question if we can't determine
             return False
 
+    def analyze_question(self, question: str, model=None, categories: dict = DICT_CATEGORIES) -> dict:
+        """
+        Classify theme, subtheme, error flag and difficulty of a question in a single call.
+        
+        Args:
+            question: The question or error message to analyze
+            model: Optional model to use for the analysis
+            categories: Themes and subthemes to choose from
+            
+        Returns:
+            dict: theme, subtheme, is_error_msg and difficulty. Falls back to the
+            separate classifier calls if the structured answer cannot be used.
+        """
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Analyzing question using model: {model}")
+        self.logger.debug(f"Question: {question[:50]}...")
+        
+        try:
+            response = self.complete(self._analysis_messages(question, categories), model=model, temperature=0.3, format="json")
+            
+            analysis = parse_question_analysis(response, categories)
+            if analysis is not None:
+                self.logger.debug(f"Analysis result: {analysis}")
+                return analysis
+            self.logger.warning("Invalid structured analysis, falling back to separate classifier calls")
+            
+        except Exception as e:
+            self.logger.error(f"Error in analyze_question: {str(e)}")
+        
+        return self.analyze_question_separately(question, model=model, categories=categories)
+
+    async def aanalyze_question(self, question: str, model=None, categories: dict = DICT_CATEGORIES) -> dict:
+        if not model:
+            model = self.default_model
+            
+        self.logger.info(f"Analyzing question asynchronously using model: {model}")
+        
+        try:
+            response = await self.acomplete(self._analysis_messages(question, categories), model=model, temperature=0.3, format="json")
+            
+            analysis = parse_question_analysis(response, categories)
+            if analysis is not None:
+                return analysis
+            self.logger.warning("Invalid structured analysis, falling back to separate classifier calls")
+            
+        except Exception as e:
+            self.logger.error(f"Error in aanalyze_question: {str(e)}")
+        
+        return await run_blocking(self.analyze_question_separately, question, model=model, categories=categories)
+
+    @staticmethod
+    def _analysis_messages(question, categories):
+        return [
+            {"role": "system", "content": "You are a classifier that analyzes questions and answers in JSON."},
+            {"role": "user", "content": build_analysis_prompt(question, categories)}
+        ]
+
     def embed(self, text, model=None):
         """Get embeddings for the provided text.
         
@@ -294,7 +547,7 @@ class OllamaProvider(LLMProvider):
             model: Optional embedding model to use
             
         Returns:
-            list: The embedding vector
+            numpy.ndarray: The embedding vector, read-only float32 shared with the embedding cache
         """
         if not model:
             model = self.default_model
@@ -302,8 +555,13 @@ class OllamaProvider(LLMProvider):
         self.logger.info(f"Getting embedding using model: {model}")
         self.logger.debug(f"Text: {text[:50]}...")
         
+        cached = embedding_cache.get(model, text)
+        if cached is not None:
+            self.logger.debug("Embedding served from cache")
+            return cached
+        
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/embeddings",
                 json={
                     "model": model,
@@ -313,7 +571,7 @@ class OllamaProvider(LLMProvider):
             
             embedding = response.json()['embedding']
             self.logger.debug(f"Received embedding of dimension {len(embedding)}")
-            return embedding
+            return embedding_cache.put(model, text, embedding)
             
         except Exception as e:
             self.logger.error(f"Embedding error: {str(e)}")
@@ -1,12 +1,16 @@
 import os
 import logging
 from openai import OpenAI
-from .base import LLMProvider
+from .base import LLMProvider, build_analysis_prompt, build_chat_messages, parse_question_analysis
+from config import DICT_CATEGORIES
+from utils.error_detection import detect_error_message
 
 #TODO: revamp the following with langchain structured outputs
 
 class OpenAIProvider(LLMProvider):
     
+    name = "openai"
+    
     def __init__(self, api_key: str):
         
         self.client = OpenAI(api_key=api_key)
@@ -62,26 +66,49 @@ class OpenAIProvider(LLMProvider):
         except Exception as e:
             self.logger.error(f"Error getting response: {str(e)}")
             return f"Error from OpenAI API: {str(e)}"
+
+    def _complete(self, model, messages, temperature=None, max_tokens=None, **options) -> str:
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        response = self.client.chat.completions.create(model=model, messages=messages, **options)
+        return response.choices[0].message.content
+
+    def _stream_completion(self, model, messages):
+        """Yield the content deltas of a streamed chat completion."""
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def stream_response(self, question: str, model=None):
+        """Yield the answer to a question token by token."""
+        if not model:
+            model = self.default_model
+        
+        self.logger.info(f"Streaming response using model: {model}")
+        
+        try:
+            yield from self._stream_completion(model, [{"role": "user", "content": question}])
+            self.logger.info("Streamed response received successfully")
+        except Exception as e:
+            self.logger.error(f"Error streaming response: {str(e)}")
+            yield f"Error from OpenAI API: {str(e)}"
         
     def get_chat_response(self, message, history=None, model="gpt-4o-mini"):
         """Get a response in a multi-turn conversation."""
         self.logger.info(f"Getting chat response using model: {model}")
         
         try:
-            # Start with system message
-            messages = [{"role": "system", "content": "You are a helpful AI assistant."}]
-            
-            # Add conversation history if provided
-            if history and len(history) > 0:
-                messages.extend(history)
-            
-            # Add the new user message
-            messages.append({"role": "user", "content": message})
-            
             # Get response from OpenAI
             response = self.client.chat.completions.create(
                 model=model,
-                messages=messages
+                messages=build_chat_messages(message, history)
             )
             
             self.logger.info("Chat response received successfully")
@@ -89,6 +116,17 @@ class OpenAIProvider(LLMProvider):
         except Exception as e:
             self.logger.error(f"Error getting chat response: {str(e)}")
             return f"Error: {str(e)}"    
+
+    def stream_chat_response(self, message, history=None, model="gpt-4o-mini"):
+        """Yield the reply in a multi-turn conversation token by token."""
+        self.logger.info(f"Streaming chat response using model: {model}")
+        
+        try:
+            yield from self._stream_completion(model, build_chat_messages(message, history))
+            self.logger.info("Streamed chat response received successfully")
+        except Exception as e:
+            self.logger.error(f"Error streaming chat response: {str(e)}")
+            yield f"Error: {str(e)}"
     
     def classify_theme(self, question: str, categories: list, model=None) -> str:
         if not model:
@@ -102,17 +140,17 @@ class OpenAIProvider(LLMProvider):
         Question: {question}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
+            response = self.complete(
+                [
                     {"role": "system", "content": "You are a classifier that categorizes questions."},
                     {"role": "user", "content": prompt}
                 ],
+                model=model,
                 max_tokens=50,
                 temperature=0.3
             )
             
-            theme = response.choices[0].message.content.strip().lower()
+            theme = response.strip().lower()
             # Ensure the theme is one of the valid categories
             if theme not in categories:
                 theme = "other"
@@ -138,17 +176,17 @@ class OpenAIProvider(LLMProvider):
         Question: {question}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
+            response = self.complete(
+                [
                     {"role": "system", "content": "You are a classifier that categorizes questions into subcategories."},
                     {"role": "user", "content": prompt}
                 ],
+                model=model,
                 max_tokens=50,
                 temperature=0.3
             )
             
-            subtheme = response.choices[0].message.content.strip().lower()
+            subtheme = response.strip().lower()
             # Ensure the subtheme is one of the valid subcategories
             if subtheme not in theme_subcategories:
                 subtheme = "other"
@@ -185,17 +223,17 @@ class OpenAIProvider(LLMProvider):
         Question/Error: {question}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
+            response = self.complete(
+                [
                     {"role": "system", "content": "You are an expert at evaluating the difficulty level of programming questions."},
                     {"role": "user", "content": prompt}
                 ],
+                model=model,
                 max_tokens=50,
                 temperature=0.3
             )
             
-            difficulty = response.choices[0].message.content.strip().lower()
+            difficulty = response.strip().lower()
             # Ensure the response is one of the valid difficulty levels
             if difficulty not in ["beginner", "intermediate", "advanced"]:
                 difficulty = "intermediate"  # Default to intermediate if response is unclear
@@ -216,6 +254,11 @@ class OpenAIProvider(LLMProvider):
         Returns:
             bool: True if the prompt appears to be an error message, False otherwise
         """
+        # Clear cases are decided by rules, only ambiguous text goes to the model
+        detected = detect_error_message(prompt)
+        if detected is not None:
+            return detected
+        
         if not model:
             model = self.default_model
         
@@ -229,20 +272,60 @@ class OpenAIProvider(LLMProvider):
         Text: {prompt}"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
+            response = self.complete(
+                [
                     # {"role": "system", "content": "You analyze text to determine if it contains an error message."},
                     {"role": "user", "content": analysis_prompt}
                 ],
+                model=model,
                 max_tokens=20,
                 temperature=0.1
             )
             
-            result = response.choices[0].message.content.strip().lower()
+            result = response.strip().lower()
             return result == "error"
             
         except Exception as e:
             self.logger.error(f"Error determining if text is error message: {str(e)}")
             # Default to assuming it's a question if we can't determine
-            return False
\ No newline at end of file
+            return False
+
+    def analyze_question(self, question: str, model=None, categories: dict = DICT_CATEGORIES) -> dict:
+        """
+        Classify theme, subtheme, error flag and difficulty of a question in a single call.
+        
+        Args:
+            question: The question or error message to analyze
+            model: Optional model to use for the analysis
+            categories: Themes and subthemes to choose from
+            
+        Returns:
+            dict: theme, subtheme, is_error_msg and difficulty. Falls back to the
+            separate classifier calls if the structured answer cannot be used.
+        """
+        if not model:
+            model = self.default_model
+        
+        self.logger.info(f"Analyzing question using model: {model}")
+        
+        try:
+            response = self.complete(
+                [
+                    {"role": "system", "content": "You are a classifier that analyzes questions and answers in JSON."},
+                    {"role": "user", "content": build_analysis_prompt(question, categories)}
+                ],
+                model=model,
+                response_format={"type": "json_object"},
+                max_tokens=100,
+                temperature=0.3
+            )
+            
+            analysis = parse_question_analysis(response, categories)
+            if analysis is not None:
+                return analysis
+            self.logger.warning("Invalid structured analysis, falling back to separate classifier calls")
+            
+        except Exception as e:
+            self.logger.error(f"Error analyzing question: {str(e)}")
+        
+        return self.analyze_question_separately(question, model=model, categories=categories)
\ No newline at end of file
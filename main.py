@@ -1,10 +1,10 @@
-import sqlite3
 import os
 import logging
 import json
+import asyncio
 
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,10 +12,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from typing import Optional
-from datetime import datetime
-import plotly.express as px
-import plotly.io as pio
-import pandas as pd
+from datetime import date, datetime
+import plotly
 import markdown  # Add markdown library
 from markdown.extensions import codehilite, fenced_code, tables
 
@@ -27,13 +25,40 @@ from config import (
     DEFAULT_PROVIDER,
     DICT_DEFAULT_MODEL,
     THEME_ANALYSIS_MODEL,
-    DIFFICULTY_ANALYSIS_MODEL,
-    DICT_CATEGORIES
+    DICT_CATEGORIES,
+    DB_PATH,
+    DATABASE_PAGE_SIZE,
+    CONVERSATIONS_PAGE_SIZE,
+    ENRICHMENT_WORKERS,
+    ENRICHMENT_MAX_ATTEMPTS,
+    VECTOR_INDEX_BACKEND,
+    ANN_INDEX_PATH,
+    ANN_N_LISTS,
+    ANN_N_PROBE,
+    ANALYZE_INTERVAL_HOURS,
+    ANSWER_CACHE_ENABLED,
+    RESPONSE_CACHE_ENABLED,
+    THEME_CLASSIFIER_ENABLED
 )
 
 DEFAULT_LLM_HINTER = DICT_DEFAULT_MODEL["openai"]
 
-from utils.embedding_models import get_embedding
+from database import get_connection, close_all_connections
+from database.maintenance import create_indexes, run_periodic_analyze
+from database.rollups import create_rollups
+from database.conversation_summaries import create_conversation_summaries
+from database.repository import Repository
+from utils.answer_cache import answer_cache
+from utils.chat_history import ChatHistory
+from utils.render_cache import RenderCache
+from utils.response_cache import response_cache
+from utils.theme_classifier import theme_classifier
+from utils.embedding_models import get_embedding, EMBEDDING_MODEL
+from utils.embedding_storage import pack_embedding, unpack_embedding, migrate_text_embeddings
+from utils.enrichment import run_blocking, classify_question
+from utils.enrichment_queue import EnrichmentQueue
+from utils.vector_index import VectorIndex
+from utils.ann_index import IVFFlatIndex
 
 # Configure basic logging
 logging.basicConfig(
@@ -48,10 +73,10 @@ logger = logging.getLogger(__name__)
 
 SUBJECT_CATEGORIES = DICT_CATEGORIES.keys()
 
-DB = 'questions.db'
+DB = DB_PATH
 
 def init_db():
-    with sqlite3.connect(DB) as conn:
+    with get_connection(DB) as conn:
         # Create the table if it doesn't exist
         conn.execute("""
             CREATE TABLE IF NOT EXISTS questions (
@@ -84,12 +109,29 @@ def init_db():
             )
         """)
         
-        # Create question_embeddings table
+        # Create enrichment_jobs table (durable queue of background classification jobs)
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS question_embeddings (
+            CREATE TABLE IF NOT EXISTS enrichment_jobs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                question TEXT NOT NULL,
-                embeddings TEXT NOT NULL
+                question_id INTEGER NOT NULL,
+                provider TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at DATETIME NOT NULL,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_status ON enrichment_jobs (status, next_attempt_at)")
+        
+        # Create chat_history_summaries table (rolling summary of the older turns of every conversation, see utils.chat_history)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chat_history_summaries (
+                conversation_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_until INTEGER NOT NULL,
+                updated_at DATETIME NOT NULL
             )
         """)
         
@@ -123,7 +165,48 @@ def init_db():
         if 'helpful' not in column_names:
             conn.execute("ALTER TABLE questions ADD COLUMN helpful INTEGER")
             
+        # "llm" or "embedding" (utils.theme_classifier); NULL for questions classified before
+        if 'theme_source' not in column_names:
+            conn.execute("ALTER TABLE questions ADD COLUMN theme_source TEXT")
+            
+        # Embeddings are stored as packed float32 BLOBs along with their dimension and model
+        if 'embedding' not in column_names:
+            conn.execute("ALTER TABLE questions ADD COLUMN embedding BLOB")
+            
+        if 'embedding_dim' not in column_names:
+            conn.execute("ALTER TABLE questions ADD COLUMN embedding_dim INTEGER")
+            
+        if 'embedding_model' not in column_names:
+            conn.execute("ALTER TABLE questions ADD COLUMN embedding_model TEXT")
+            
+        # Rendered HTML of the assistant messages, along with the RENDERER_VERSION that rendered it
+        cursor.execute("PRAGMA table_info(conversations)")
+        conversation_column_names = [column[1] for column in cursor.fetchall()]
+        
+        if 'html' not in conversation_column_names:
+            conn.execute("ALTER TABLE conversations ADD COLUMN html TEXT")
+            
+        if 'html_version' not in conversation_column_names:
+            conn.execute("ALTER TABLE conversations ADD COLUMN html_version INTEGER")
+            
+        # The question_embeddings table was never used, embeddings live in the questions table
+        if conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'question_embeddings'").fetchone():
+            if conn.execute("SELECT COUNT(*) FROM question_embeddings").fetchone()[0] == 0:
+                conn.execute("DROP TABLE question_embeddings")
+        
+        # Indexes of the chat, /conversations, /database and /visualization queries
+        create_indexes(conn)
+        
+        # Per-day counts of /visualization, kept up to date by triggers on the questions table
+        create_rollups(conn)
+        
+        # One row per conversation for /conversations, kept up to date by triggers on the conversations table
+        create_conversation_summaries(conn)
+            
         conn.commit()
+        
+        # Convert embeddings written as JSON text by older versions (no-op once done)
+        migrate_text_embeddings(conn, EMBEDDING_MODEL)
 
 # @app.on_event("startup")
 # async def startup_event():
@@ -134,7 +217,26 @@ async def lifespan(app: FastAPI):
     # Load the ML model
     init_db()
     logger.info("init_db() initialized from lifespan function with asynxcontextmanager")
+    await load_question_index()
+    schedule_question_index_training()
+    if ANSWER_CACHE_ENABLED:
+        await run_blocking(answer_cache.load)
+    if THEME_CLASSIFIER_ENABLED:
+        await run_blocking(theme_classifier.load, DB)
+    await enrichment_queue.start()
+    analyze_task = asyncio.create_task(run_periodic_analyze(DB, ANALYZE_INTERVAL_HOURS * 3600))
     yield
+    analyze_task.cancel()
+    await enrichment_queue.stop()
+    await chat_history.stop()
+    if isinstance(question_index, IVFFlatIndex):
+        question_index.save(ANN_INDEX_PATH)
+    for llm_provider in providers.values():
+        llm_provider.close()
+        await llm_provider.aclose()
+    repository.close()
+    logger.info(f"Answer cache: {answer_cache.metrics()}")
+    close_all_connections()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -160,6 +262,89 @@ providers = {
     'openai': OpenAIProvider(OPENAI_API_KEY),
     'ollama': OllamaProvider(),
 }
+if RESPONSE_CACHE_ENABLED:
+    # Classification of unchanged text is answered from disk
+    for llm_provider in providers.values():
+        llm_provider.response_cache = response_cache
+
+# Async access to the questions and conversations tables, off the event loop
+repository = Repository(DB)
+
+# Token-budgeted history of the chat conversations, with a rolling summary of their older turns
+chat_history = ChatHistory(repository)
+
+# Process-wide index of question embeddings used for the similar-question lookup
+if VECTOR_INDEX_BACKEND == "ivf":
+    question_index = IVFFlatIndex(n_lists=ANN_N_LISTS, n_probe=ANN_N_PROBE)
+else:
+    question_index = VectorIndex()
+
+async def load_question_index(batch_size=500):
+    """
+    Fill the in-memory index from the database.
+
+    A saved IVF index is loaded from disk first; in every case the index is then
+    reconciled with the questions table, so only rows missing from it are decoded.
+    """
+    if isinstance(question_index, IVFFlatIndex) and os.path.exists(ANN_INDEX_PATH):
+        await run_blocking(question_index.load, ANN_INDEX_PATH)
+        logger.info(f"Loaded {len(question_index)} question embeddings from {ANN_INDEX_PATH}")
+    
+    stored_ids = set(await repository.embedded_question_ids())
+    indexed_ids = set(question_index.ids())
+    for q_id in indexed_ids - stored_ids:
+        question_index.remove(q_id)
+    
+    missing_ids = sorted(stored_ids - indexed_ids)
+    for start in range(0, len(missing_ids), batch_size):
+        rows = await repository.fetch_embeddings(missing_ids[start:start + batch_size])
+        question_index.add_many((q_id, unpack_embedding(q_embedding)) for q_id, q_embedding in rows)
+    logger.info(f"Vector index holds {len(question_index)} question embeddings ({len(missing_ids)} loaded from the database)")
+
+# Keep references to fire-and-forget tasks so they are not garbage collected while running
+background_tasks = set()
+
+def schedule_question_index_training():
+    """Re-cluster the approximate index in the background once it has grown enough."""
+    if getattr(question_index, "needs_training", False):
+        task = asyncio.create_task(run_blocking(question_index.train))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def run_enrichment_job(question_id, provider):
+    """Fill in the analytics columns of a stored question (theme, subtheme, error flag, difficulty, embedding)."""
+    llm_provider = providers.get(provider)
+    if llm_provider is None:
+        raise ValueError(f"Unknown provider '{provider}'")
+    
+    row = await repository.fetch_question(question_id)
+    if row is None:
+        logger.info(f"Question {question_id} was deleted before enrichment, skipping")
+        return
+    question, embedding = row
+    
+    if embedding is None:
+        question_embedding = await run_blocking(get_embedding, question)
+        await repository.update_question_embedding(
+            question_id, pack_embedding(question_embedding), len(question_embedding), EMBEDDING_MODEL
+        )
+        question_index.add(question_id, question_embedding)
+    else:
+        question_embedding = unpack_embedding(embedding)
+    
+    classification = await classify_question(
+        llm_provider, question, question_embedding,
+        theme_classifier if THEME_CLASSIFIER_ENABLED else None
+    )
+    
+    await repository.update_question_analysis(question_id, classification)
+
+enrichment_queue = EnrichmentQueue(
+    DB,
+    run_enrichment_job,
+    workers=ENRICHMENT_WORKERS,
+    max_attempts=ENRICHMENT_MAX_ATTEMPTS
+)
 
 
 
@@ -177,6 +362,10 @@ async def index(request: Request):
     )
 
 # Add a function to convert markdown to HTML
+# Version of the output of convert_markdown_to_html: bump it when the rendering changes, chat
+# messages stored with the HTML of another version are then rendered again when displayed
+RENDERER_VERSION = 1
+
 def convert_markdown_to_html(md_text):
     # Pre-process LaTeX equations to protect them from markdown processing
     # Save inline math: $...$
@@ -218,6 +407,150 @@ def convert_markdown_to_html(md_text):
     
     return html
 
+async def find_similar_questions(question, question_embedding, timestamp):
+    """
+    Look up the closest previous questions to a new question.
+
+    Returns:
+        tuple: list of similar question dicts and the text of the first one above 90% similarity (or None)
+    """
+    similar_questions = []
+    highly_similar_question = None
+
+    # Over-fetch a little so that stored copies of the exact same question can be skipped
+    top_n = 2
+    neighbours = await run_blocking(question_index.search, question_embedding, k=top_n + 8)
+    if not neighbours:
+        return similar_questions, highly_similar_question
+
+    rows = await repository.fetch_questions([q_id for q_id, _ in neighbours])
+    question_texts = {q_id: q_text for q_id, q_text, _ in rows}
+    question_timestamps = {q_id: q_timestamp for q_id, _, q_timestamp in rows}  # Store timestamps for each question
+
+    similar_results = [
+        ({"id": q_id, "text": question_texts[q_id]}, score)
+        for q_id, score in neighbours
+        if q_id in question_texts and question_texts[q_id] != question
+    ][:top_n]
+
+    for result in similar_results:
+        q_id = result[0]["id"]
+        q_text = result[0]["text"]
+        similarity = round(result[1] * 100, 2)
+
+        # Calculate days elapsed
+        days_elapsed = None
+        if q_id in question_timestamps:
+            try:
+                # Parse the timestamp
+                question_date = datetime.strptime(question_timestamps[q_id], "%Y-%m-%d %H:%M:%S.%f")
+                days_elapsed = (timestamp - question_date).days
+            except ValueError:
+                # Try without microseconds if that format fails
+                try:
+                    question_date = datetime.strptime(question_timestamps[q_id], "%Y-%m-%d %H:%M:%S")
+                    days_elapsed = (timestamp - question_date).days
+                except:
+                    logging.error(f"Could not parse timestamp for question {q_id}")
+
+        similar_questions.append({
+            "id": q_id,
+            "text": q_text,
+            "similarity": similarity,
+            "days_elapsed": days_elapsed
+        })
+
+        if similarity > 90 and highly_similar_question is None:
+            highly_similar_question = q_text
+
+    return similar_questions, highly_similar_question
+
+async def generate_hints(llm_provider, question):
+    """Generate the brief and the detailed hint for a question concurrently, rendered as HTML."""
+    # Generate the initial brief hint
+    hint_prompt = f"""A user has asked this question: "{question}"
+    
+    Please provide a brief hint (2-3 sentences) to help the user think about their question differently or explore related concepts, without directly answering the question.
+    Make the hint helpful but not a direct answer. Encourage critical thinking."""
+
+    # Generate a more detailed and suggestive hint
+    detailed_hint_prompt = f"""A user has asked this question: "{question}"
+    
+    The user initially saw a brief hint but needs more guidance. Please provide a more detailed hint that:
+    1. Suggests specific approaches or techniques to solve the problem
+    2. Mentions relevant concepts, libraries, or methods that might help
+    3. Offers a structured way to think about the problem
+    4. Includes 1-2 resources or documentation links if appropriate
+    
+    Don't directly solve the problem, but provide enough guidance that the user can make significant progress.
+    Format your response with clear sections and use markdown for better readability."""
+
+    hint, detailed_hint = await asyncio.gather(
+        llm_provider.aget_response(hint_prompt, model=DEFAULT_LLM_HINTER),
+        llm_provider.aget_response(detailed_hint_prompt, model=DEFAULT_LLM_HINTER),
+    )
+    # Both hints are rendered in a single worker call, off the event loop
+    hint_html, detailed_hint_html = await run_blocking(convert_messages_to_html, [hint, detailed_hint])
+    return hint_html, detailed_hint_html
+
+async def answer_context(llm_provider, question, question_embedding, timestamp, hints=True):
+    """
+    Look up the previous questions similar to a new question and, if one of them is
+    nearly identical, generate the hints shown before the answer.
+
+    Returns:
+        dict: the template context (similar_questions, show_hint, hint, detailed_hint)
+    """
+    # Retrieve similar questions from the database
+    similar_questions, highly_similar_question = await find_similar_questions(
+        question, question_embedding, timestamp
+    )
+    
+    # If there's a highly similar question, generate the hints while the answer is still running
+    show_hint = hints and highly_similar_question is not None
+    hint = None
+    detailed_hint = None  # Initialize the detailed hint variable
+    if show_hint:
+        hint, detailed_hint = await generate_hints(llm_provider, question)
+    
+    return {
+        "similar_questions": similar_questions,
+        "show_hint": show_hint,
+        "hint": hint,
+        "detailed_hint": detailed_hint
+    }
+
+async def cached_answer(provider, model, question_embedding):
+    """The cached answer of a previous question nearly identical to this one, or None."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    return await run_blocking(answer_cache.lookup, provider, model, question_embedding)
+
+async def cache_answer(provider, model, question, question_embedding, answer, answer_html):
+    if not ANSWER_CACHE_ENABLED or answer.startswith("Error"):
+        # The providers return their errors as the answer text
+        return
+    await run_blocking(answer_cache.store, provider, model, question, question_embedding, answer, answer_html)
+
+async def store_question(question, timestamp, provider, model, question_embedding):
+    """Store an answered question with its embedding and enqueue its classification in the same transaction."""
+    question_id = await repository.insert_question(
+        question, timestamp, provider, model,
+        pack_embedding(question_embedding), len(question_embedding), EMBEDDING_MODEL,
+        on_insert=lambda conn, q_id: enrichment_queue.enqueue(conn, q_id, provider)
+    )
+    enrichment_queue.notify()
+    question_index.add(question_id, question_embedding)
+    schedule_question_index_training()
+    return question_id
+
+# Streamed responses must not be cached or buffered by a proxy
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event, data):
+    """Format a Server-Sent Event carrying a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.post("/")
 async def handle_question(
     request: Request,
@@ -233,124 +566,26 @@ async def handle_question(
     logging.info(f"llm_provider: {llm_provider}")
     
     if llm_provider:
-        answer = llm_provider.get_response(question, model=model)
-        logging.info(f"answer : {answer}")
-        # Convert markdown answer to HTML
-        answer_html = convert_markdown_to_html(answer)
-        # Use the dedicated model for theme classification
-        theme = llm_provider.classify_theme(question, SUBJECT_CATEGORIES, model=THEME_ANALYSIS_MODEL)
-        sub_theme = llm_provider.classify_subtheme(question, theme, DICT_CATEGORIES[theme], model=THEME_ANALYSIS_MODEL)
-        # Determine if the question is an error message
-        is_error_msg = llm_provider.is_error_message(question, model=THEME_ANALYSIS_MODEL)
-        # Determine difficulty of the question (easy, medium, hard)
-        difficulty = llm_provider.judge_difficulty_level(question, model=DIFFICULTY_ANALYSIS_MODEL)
-        # compute embedding of the question and store it in the db.
-        question_embedding = get_embedding(question)
-        
-        # Retrieve similar questions from the database
-        similar_questions = []
-        show_hint = False
-        hint = None
-        
-        with sqlite3.connect(DB) as conn:
-            # Get all previous questions with their embeddings
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, question, embedding, timestamp FROM questions WHERE question != ?", (question,))
-            previous_questions = cursor.fetchall()
-            
-            # Convert string embeddings back to lists of floats
-            vector_db = []
-            question_timestamps = {}  # Store timestamps for each question
-            
-            for q_id, q_text, q_embedding, q_timestamp in previous_questions:
-                try:
-                    # Parse the embedding from string representation to list
-                    embedding_list = json.loads(q_embedding.replace("'", "\"")) if q_embedding else None
-                    if embedding_list:
-                        vector_db.append(({"id": q_id, "text": q_text}, embedding_list))
-                        question_timestamps[q_id] = q_timestamp  # Save the timestamp
-                except (json.JSONDecodeError, AttributeError) as e:
-                    logging.error(f"Error parsing embedding for question {q_id}: {e}")
-            
-            # Find similar questions if we have any in the database
-            if vector_db:
-                from utils.embedding_models import retrieve_n_closest_vectors
-                similar_results = retrieve_n_closest_vectors(question, vector_db, top_n=2)
-                
-                # Check if there is a highly similar question (>90%)
-                has_high_similarity = False
-                highly_similar_question = None
-                
-                for result in similar_results:
-                    q_id = result[0]["id"]
-                    q_text = result[0]["text"]
-                    similarity = round(result[1] * 100, 2)
-                    
-                    # Calculate days elapsed
-                    days_elapsed = None
-                    if q_id in question_timestamps:
-                        try:
-                            # Parse the timestamp
-                            question_date = datetime.strptime(question_timestamps[q_id], "%Y-%m-%d %H:%M:%S.%f")
-                            days_elapsed = (timestamp - question_date).days
-                        except ValueError:
-                            # Try without microseconds if that format fails
-                            try:
-                                question_date = datetime.strptime(question_timestamps[q_id], "%Y-%m-%d %H:%M:%S")
-                                days_elapsed = (timestamp - question_date).days
-                            except:
-                                logging.error(f"Could not parse timestamp for question {q_id}")
-                    
-                    similar_questions.append({
-                        "id": q_id, 
-                        "text": q_text, 
-                        "similarity": similarity,
-                        "days_elapsed": days_elapsed
-                    })
-                    
-                    if similarity > 90 and not has_high_similarity:
-                        has_high_similarity = True
-                        highly_similar_question = q_text
-                
-                # If there's a highly similar question, generate a hint
-                detailed_hint = None  # Initialize the detailed hint variable
-                if has_high_similarity and highly_similar_question:
-                    show_hint = True
-                    
-                    # Generate the initial brief hint
-                    hint_prompt = f"""A user has asked this question: "{question}"
-                    
-                    Please provide a brief hint (2-3 sentences) to help the user think about their question differently or explore related concepts, without directly answering the question.
-                    Make the hint helpful but not a direct answer. Encourage critical thinking."""
-                    
-                    hint = llm_provider.get_response(hint_prompt, model=DEFAULT_LLM_HINTER)
-                    hint = convert_markdown_to_html(hint)
-                    
-                    # Generate a more detailed and suggestive hint
-                    detailed_hint_prompt = f"""A user has asked this question: "{question}"
-                    
-                    The user initially saw a brief hint but needs more guidance. Please provide a more detailed hint that:
-                    1. Suggests specific approaches or techniques to solve the problem
-                    2. Mentions relevant concepts, libraries, or methods that might help
-                    3. Offers a structured way to think about the problem
-                    4. Includes 1-2 resources or documentation links if appropriate
-                    
-                    Don't directly solve the problem, but provide enough guidance that the user can make significant progress.
-                    Format your response with clear sections and use markdown for better readability."""
-                    
-                    detailed_hint = llm_provider.get_response(detailed_hint_prompt, model=DEFAULT_LLM_HINTER)
-                    detailed_hint = convert_markdown_to_html(detailed_hint)
-
-    # Store the question with its embedding
-    with sqlite3.connect(DB) as conn:
-        conn.execute(
-            "INSERT INTO questions (question, timestamp, theme, subtheme, provider, model, is_error, difficulty, is_error_msg, helpful, embedding) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (question, timestamp, theme, sub_theme, provider, model, is_error_msg, difficulty, is_error_msg, None, json.dumps(question_embedding))
-        )
-        # Get the last insert id
-        cursor = conn.cursor()
-        cursor.execute("SELECT last_insert_rowid()")
-        question_id = cursor.fetchone()[0]
+        # Embed the question first: a repeat of a previous question is answered from the cache,
+        # without calling the LLM. Classification is left to the background enrichment queue.
+        question_embedding = await run_blocking(get_embedding, question)
+        cached = await cached_answer(provider, model, question_embedding)
+        if cached:
+            answer, answer_html = cached["answer"], cached["answer_html"]
+            context = await answer_context(llm_provider, question, question_embedding, timestamp, hints=False)
+        else:
+            # Start the answer right away; the similar questions and hints are computed meanwhile
+            answer_task = asyncio.create_task(llm_provider.aget_response(question, model=model))
+            context = await answer_context(llm_provider, question, question_embedding, timestamp)
+
+            answer = await answer_task
+            logging.info(f"answer : {answer}")
+            # Convert markdown answer to HTML, off the event loop
+            answer_html = await run_blocking(convert_markdown_to_html, answer)
+            await cache_answer(provider, model, question, question_embedding, answer, answer_html)
+        context["cached"] = cached is not None
+
+    question_id = await store_question(question, timestamp, provider, model, question_embedding)
     
     # Get available models for each provider (for the response template)
     available_models = {}
@@ -367,238 +602,238 @@ async def handle_question(
             "providers": providers.keys(), 
             "models": available_models,
             "question_id": question_id,
-            "similar_questions": similar_questions,
-            "show_hint": show_hint,
-            "hint": hint,
-            "detailed_hint": detailed_hint  # Add the detailed hint to the context
+            **context
         }
     )
 
+@app.post("/stream")
+async def stream_question(
+    question: str = Form(...),
+    provider: str = Form(DEFAULT_PROVIDER),
+    model: str = Form(DICT_DEFAULT_MODEL[DEFAULT_PROVIDER])
+):
+    """
+    Answer a question as Server-Sent Events: a "token" event for every piece of the answer
+    as it is generated, then a "done" event with the rendered answer section once the
+    question is stored (or an "error" event). An answer served from the cache comes
+    as a single "done" event.
+    """
+    timestamp = datetime.now()
+    llm_provider = providers.get(provider)
+    
+    async def events():
+        if llm_provider is None:
+            yield sse_event("error", f"Unknown provider '{provider}'")
+            return
+        
+        context_task = None
+        try:
+            question_embedding = await run_blocking(get_embedding, question)
+            cached = await cached_answer(provider, model, question_embedding)
+            if cached:
+                answer_html = cached["answer_html"]
+                context = await answer_context(llm_provider, question, question_embedding, timestamp, hints=False)
+            else:
+                context_task = asyncio.create_task(answer_context(llm_provider, question, question_embedding, timestamp))
+                chunks = []
+                async for token in llm_provider.astream_response(question, model=model):
+                    chunks.append(token)
+                    yield sse_event("token", token)
+                answer = "".join(chunks)
+                answer_html = await run_blocking(convert_markdown_to_html, answer)
+                context = await context_task
+                await cache_answer(provider, model, question, question_embedding, answer, answer_html)
+            context["cached"] = cached is not None
+            question_id = await store_question(question, timestamp, provider, model, question_embedding)
+        except Exception as e:
+            logger.error(f"Streaming answer failed: {e}")
+            yield sse_event("error", str(e))
+            return
+        finally:
+            if context_task is not None:
+                context_task.cancel()
+        
+        html = templates.get_template("_answer.html").render(
+            answer=answer_html,
+            question_id=question_id,
+            **context
+        )
+        yield sse_event("done", {"question_id": question_id, "html": html, "cached": context["cached"]})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/api/answer_cache")
+async def answer_cache_metrics():
+    """Hit rate and size of the semantic answer cache since startup."""
+    return answer_cache.metrics()
+
 # Add new endpoint for helpfulness feedback
 @app.get("/feedback/{question_id}/{helpful}")
 async def submit_feedback(question_id: int, helpful: int):
-    with sqlite3.connect(DB) as conn:
-        conn.execute("UPDATE questions SET helpful = ? WHERE id = ?", (helpful, question_id))
+    await repository.update_question_feedback(question_id, helpful)
     return {"success": True}
 
+def question_filters(theme=None, subtheme=None, difficulty=None, provider=None, helpful=None):
+    """Filters of the /database listing; empty values do not filter."""
+    return {
+        "theme": theme or None,
+        "subtheme": subtheme or None,
+        "difficulty": difficulty or None,
+        "provider": provider or None,
+        "helpful": {"1": 1, "0": 0, "none": "none"}.get(helpful),
+    }
+
+async def question_page(before=None, before_id=None, **filters):
+    """Questions of one page of /database, and the keyset of the next page (None on the last page)."""
+    cursor = (before, before_id) if before is not None and before_id is not None else None
+    questions = await repository.list_questions(cursor, DATABASE_PAGE_SIZE + 1, **filters)
+    next_page = None
+    if len(questions) > DATABASE_PAGE_SIZE:
+        questions = questions[:DATABASE_PAGE_SIZE]
+        next_page = (questions[-1][2], questions[-1][0])
+    return {"questions": questions, "next_page": next_page}
+
 @app.get("/database", response_class=HTMLResponse)
 async def database(request: Request):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, question, timestamp, theme, subtheme, provider, model, is_error, difficulty, is_error_msg, helpful, embedding FROM questions ORDER BY timestamp DESC")
-        questions = cursor.fetchall()
+    page = await question_page(**question_filters())
     return templates.TemplateResponse(
         "database.html",
-        {"request": request, "questions": questions}
+        {
+            "request": request,
+            **page,
+            "total_questions": await repository.count_questions(),
+            "categories": DICT_CATEGORIES,
+            "providers": list(providers),
+        }
     )
 
+@app.get("/database/questions", response_class=HTMLResponse)
+async def database_questions(request: Request, theme: Optional[str] = None, subtheme: Optional[str] = None,
+                             difficulty: Optional[str] = None, provider: Optional[str] = None,
+                             helpful: Optional[str] = None, before: Optional[str] = None, before_id: Optional[int] = None):
+    """Table rows of one page of questions, for the filters and the "Load more" button of /database."""
+    page = await question_page(before, before_id, **question_filters(theme, subtheme, difficulty, provider, helpful))
+    return templates.TemplateResponse("_question_rows.html", {"request": request, **page})
+
 @app.get("/delete_question/{id}")  # Changed to match the URL in the template
 async def delete_question(id: int):
-    with sqlite3.connect(DB) as conn:
-        conn.execute("DELETE FROM questions WHERE id = ?", (id,))
+    await repository.delete_question(id)
+    question_index.remove(id)
     return RedirectResponse(url="/database")
 
 @app.get("/clear_database")  # Changed to match the URL in the template
 async def clear_database():
-    with sqlite3.connect(DB) as conn:
-        conn.execute("DELETE FROM questions")
+    await repository.clear_questions()
+    question_index.clear()
     return RedirectResponse(url="/database")
 
+def rollup_counts(rollups, column):
+    """Number of questions per value of a rollup column, most frequent first (like value_counts)."""
+    return rollups.groupby(column)['count'].sum().sort_values(ascending=False).reset_index()
+
+def label_counts(counts, column, labels=None):
+    """{"labels": [...], "counts": [...]} of a rollup_counts frame, values optionally renamed."""
+    values = counts[column].tolist()
+    return {
+        "labels": [labels.get(value, value) for value in values] if labels else values,
+        "counts": counts['count'].tolist(),
+    }
+
+DIFFICULTY_ORDER = {'easy': 0, 'medium': 1, 'hard': 2, 'unknown': 3}
+DIFFICULTY_LEVELS = {'easy': 'Beginner', 'medium': 'Intermediate', 'hard': 'Advanced', 'unknown': 'Unknown'}
+
+def visualization_data(df):
+    """Chart series of /visualization from some question rollups, small enough to send as JSON."""
+    data = {"total": int(df['count'].sum())}
+    if df.empty:
+        return data
+
+    data["themes"] = label_counts(rollup_counts(df, 'theme'), 'theme')
+    subtheme_counts = df.groupby(['theme', 'subtheme'])['count'].sum().reset_index()
+    data["subthemes"] = subtheme_counts[['theme', 'subtheme', 'count']].values.tolist()
+    data["error_messages"] = label_counts(rollup_counts(df, 'is_error_msg'), 'is_error_msg',
+                                          {1: 'Error Message', 0: 'Regular Question'})
+    data["helpful"] = label_counts(rollup_counts(df, 'helpful'), 'helpful', {1: 'Helpful', 0: 'Not Helpful'})
+
+    if df['difficulty'].notna().any():
+        difficulty_counts = rollup_counts(df, 'difficulty')
+        difficulty_counts = difficulty_counts.sort_values('difficulty', key=lambda column: column.map(DIFFICULTY_ORDER), kind='stable')
+        data["difficulty"] = label_counts(difficulty_counts, 'difficulty')
+
+        # Daily share of each difficulty level, questions without one counting as Unknown
+        levels = df['difficulty'].map(DIFFICULTY_LEVELS).fillna('Unknown')
+        daily_counts = df.groupby(['day', levels])['count'].sum().unstack(fill_value=0)
+        daily_counts = daily_counts.reindex(columns=list(DIFFICULTY_LEVELS.values()), fill_value=0)
+        daily_ratios = daily_counts.div(daily_counts.sum(axis=1), axis=0) * 100
+        data["daily_difficulty"] = {
+            "days": daily_ratios.index.tolist(),
+            **{level: daily_ratios[level].round(2).tolist() for level in daily_ratios.columns},
+        }
+    return data
+
+async def build_visualization_data(start=None, end=None, theme=None):
+    """UTF-8 encoded JSON of visualization_data for the rollups of a period (bounds included) and theme."""
+    df = await repository.fetch_question_rollups(start, end, theme)
+    data = await run_blocking(visualization_data, df)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+# Chart data of the whole history (the default view of /visualization), built again in the background once the rollups change
+visualization_cache = RenderCache(build_visualization_data, repository.fetch_rollup_version)
+
+# plotly.js of the installed plotly package, at a versioned URL browsers can cache for good
+PLOTLY_JS_PATH = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+PLOTLY_JS_URL = f"/assets/plotly-{plotly.__version__}.min.js"
+
+@app.get(PLOTLY_JS_URL)
+async def plotly_js():
+    return FileResponse(PLOTLY_JS_PATH, media_type="text/javascript",
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 @app.get("/visualization", response_class=HTMLResponse)
 async def visualization(request: Request):
-    # Get data from the database
-    with sqlite3.connect(DB) as conn:
-        df = pd.read_sql_query("SELECT theme, subtheme, is_error, is_error_msg, difficulty, helpful, timestamp FROM questions WHERE theme IS NOT NULL", conn)
-    
-    # Count themes and create histogram
-    if not df.empty:
-        # Count occurrences of each theme
-        theme_counts = df['theme'].value_counts().reset_index()
-        theme_counts.columns = ['theme', 'count']
-        
-        # Create the histogram using Plotly
-        fig1 = px.bar(theme_counts, x='theme', y='count', 
-                     title='Distribution of Question Themes',
-                     labels={'theme': 'Theme', 'count': 'Number of Questions'},
-                     color='theme')
-        
-        # Make layout more attractive
-        fig1.update_layout(
-            xaxis_title="Theme Categories",
-            yaxis_title="Count",
-            template="plotly_white"
-        )
-        
-        # Create a subtheme visualization
-        if 'subtheme' in df.columns and df['subtheme'].notna().any():
-            subtheme_counts = df.groupby(['theme', 'subtheme']).size().reset_index(name='count')
-            fig2 = px.bar(subtheme_counts, x='subtheme', y='count', color='theme',
-                         title='Distribution of Question Subthemes',
-                         labels={'subtheme': 'Subtheme', 'count': 'Number of Questions'},
-                         barmode='group')
-            
-            fig2.update_layout(
-                xaxis_title="Subtheme Categories",
-                yaxis_title="Count",
-                template="plotly_white"
-            )
-            
-            # Add error vs non-error visualization
-            if 'is_error_msg' in df.columns:
-                error_counts = df['is_error_msg'].value_counts().reset_index()
-                error_counts.columns = ['is_error_msg', 'count'] 
-                error_counts['is_error_msg'] = error_counts['is_error_msg'].map({1: 'Error Message', 0: 'Regular Question'})
-                
-                fig3 = px.pie(error_counts, values='count', names='is_error_msg',
-                             title='Distribution of Error Messages vs Regular Questions')
-                
-                # Add difficulty visualization
-                if 'difficulty' in df.columns and df['difficulty'].notna().any():
-                    difficulty_counts = df['difficulty'].value_counts().reset_index()
-                    difficulty_counts.columns = ['difficulty', 'count']
-                    
-                    # Set appropriate order for difficulty levels
-                    if not difficulty_counts.empty:
-                        order_dict = {'easy': 0, 'medium': 1, 'hard': 2, 'unknown': 3}
-                        difficulty_counts['order'] = difficulty_counts['difficulty'].map(order_dict)
-                        difficulty_counts = difficulty_counts.sort_values('order')
-                        difficulty_counts = difficulty_counts.drop('order', axis=1)
-                    
-                    fig4 = px.bar(difficulty_counts, x='difficulty', y='count',
-                                title='Distribution of Question Difficulty',
-                                labels={'difficulty': 'Difficulty Level', 'count': 'Number of Questions'},
-                                color='difficulty',
-                                color_discrete_map={
-                                    'easy': 'green',
-                                    'medium': 'orange',
-                                    'hard': 'red',
-                                    'unknown': 'gray'
-                                })
-                    
-                    fig4.update_layout(
-                        xaxis_title="Difficulty Level",
-                        yaxis_title="Count",
-                        template="plotly_white"
-                    )
-                    
-                    # Convert figures to HTML
-                    plot_html = (pio.to_html(fig1, full_html=False) + "<br><br>" + 
-                               pio.to_html(fig2, full_html=False) + "<br><br>" +
-                               pio.to_html(fig3, full_html=False) + "<br><br>" +
-                               pio.to_html(fig4, full_html=False))
-                else:
-                    plot_html = (pio.to_html(fig1, full_html=False) + "<br><br>" + 
-                               pio.to_html(fig2, full_html=False) + "<br><br>" +
-                               pio.to_html(fig3, full_html=False))
-            else:
-                plot_html = pio.to_html(fig1, full_html=False) + "<br><br>" + pio.to_html(fig2, full_html=False)
-        else:
-            plot_html = pio.to_html(fig1, full_html=False)
-        
-        # Add helpfulness visualization if data exists
-        if 'helpful' in df.columns and df['helpful'].notna().any():
-            helpful_counts = df['helpful'].value_counts().reset_index()
-            helpful_counts.columns = ['helpful', 'count']
-            helpful_counts['helpful'] = helpful_counts['helpful'].map({1: 'Helpful', 0: 'Not Helpful'})
-            
-            fig_helpful = px.pie(helpful_counts, values='count', names='helpful',
-                               title='User Feedback: Helpful vs Not Helpful Responses',
-                               color='helpful',
-                               color_discrete_map={
-                                   'Helpful': 'green',
-                                   'Not Helpful': 'red'
-                               })
-            
-            # Add to plots
-            plot_html += "<br><br>" + pio.to_html(fig_helpful, full_html=False)
-        
-        # Create the daily question type ratios chart
-        if 'difficulty' in df.columns and 'timestamp' in df.columns and df['difficulty'].notna().any():
-            # Convert timestamp to date
-            df['date'] = pd.to_datetime(df['timestamp']).dt.date
-            
-            # Ensure all difficulty levels have standard names
-            difficulty_map = {
-                'easy': 'Beginner',
-                'medium': 'Intermediate',
-                'hard': 'Advanced',
-                'unknown': 'Unknown'
-            }
-            df['difficulty'] = df['difficulty'].map(difficulty_map).fillna('Unknown')
-            
-            # Group by date and difficulty, then calculate counts
-            daily_counts = df.groupby(['date', 'difficulty']).size().unstack().fillna(0)
-            
-            # If some difficulty levels are missing, add them with zeros
-            for level in ['Beginner', 'Intermediate', 'Advanced', 'Unknown']:
-                if level not in daily_counts.columns:
-                    daily_counts[level] = 0
-            
-            # Calculate the daily ratios
-            daily_total = daily_counts.sum(axis=1)
-            daily_ratios = daily_counts.div(daily_total, axis=0) * 100
-            
-            # Reset index to make date a column
-            daily_ratios = daily_ratios.reset_index()
-            
-            # Create the area chart
-            fig_daily_ratio = px.area(
-                daily_ratios, 
-                x='date', 
-                y=['Beginner', 'Intermediate', 'Advanced'],
-                title='Daily Question Difficulty Ratios',
-                labels={'value': 'Percentage', 'date': 'Date', 'variable': 'Difficulty Level'},
-                color_discrete_map={
-                    'Beginner': 'green',
-                    'Intermediate': 'orange',
-                    'Advanced': 'red'
-                }
-            )
-            
-            fig_daily_ratio.update_layout(
-                xaxis_title="Date",
-                yaxis_title="Percentage (%)",
-                template="plotly_white",
-                hovermode="x unified",
-                legend_title="Difficulty Level"
-            )
-            daily_ratio_plot = pio.to_html(fig_daily_ratio, full_html=False)
-
-            # Build a new line chart for daily difficulty ratios
-            melted_ratios = daily_ratios.melt(id_vars=["date"], var_name="Difficulty", value_name="Ratio")
-            fig_difficulty_ratio = px.line(
-                melted_ratios,
-                x="date",
-                y="Ratio",
-                color="Difficulty",
-                title="Daily Ratio of Question Difficulty Over Time (Days)"
-            )
-            fig_difficulty_ratio.update_layout(
-                xaxis_title="Date",
-                yaxis_title="Ratio (%)",
-                template="plotly_white",
-                hovermode="x unified",
-                legend_title="Difficulty"
-            )
-            difficulty_ratio_line_plot = pio.to_html(fig_difficulty_ratio, full_html=False)
-        else:
-            daily_ratio_plot = "<div class='alert alert-info'>No difficulty data available for daily ratio visualization</div>"
-            difficulty_ratio_line_plot = "<div class='alert alert-info'>No difficulty data available for difficulty ratio line chart</div>"
-    else:
-        plot_html = "<div class='alert alert-info'>No data available for visualization</div>"
-        daily_ratio_plot = "<div class='alert alert-info'>No data available for visualization</div>"
-        difficulty_ratio_line_plot = "<div class='alert alert-info'>No difficulty data available for difficulty ratio line chart</div>"
-    
+    # The charts are drawn in the browser from /api/visualization
     return templates.TemplateResponse(
         "visualization.html",
-        {
-            "request": request, 
-            "plot_html": plot_html, 
-            "daily_ratio_plot": daily_ratio_plot,
-            "difficulty_ratio_line_plot": difficulty_ratio_line_plot
-        }
+        {"request": request, "plotly_js_url": PLOTLY_JS_URL, "themes": list(SUBJECT_CATEGORIES)}
     )
 
+@app.get("/api/visualization")
+async def visualization_api(start: Optional[date] = None, end: Optional[date] = None, theme: Optional[str] = None):
+    """Chart data of the questions asked from start to end (ISO dates, both included), optionally of one theme."""
+    if start is None and end is None and theme is None:
+        body = await visualization_cache.get()
+    else:
+        body = await build_visualization_data(start.isoformat() if start else None, end.isoformat() if end else None, theme)
+    return Response(body, media_type="application/json")
+
+def render_chat_message(conversation_id, message):
+    """HTML of a message bubble of the chat page, from (is_user, text or rendered HTML, timestamp)."""
+    return templates.get_template("_chat_message.html").render(conversation_id=conversation_id, message=message)
+
+def convert_messages_to_html(messages):
+    return [convert_markdown_to_html(message) for message in messages]
+
+async def chat_messages(conversation_id):
+    """
+    Messages of a conversation for the chat page: (is_user, text or rendered HTML, timestamp).
+
+    Assistant messages are displayed from the HTML stored with them; the few without HTML of
+    the current RENDERER_VERSION (stored before, or by another version) are rendered again
+    and stored, once.
+    """
+    rows = await repository.fetch_chat_messages(conversation_id)
+    stale = [(message_id, message) for message_id, is_user, message, _, _, html_version in rows
+             if not is_user and html_version != RENDERER_VERSION]
+    rendered = {}
+    if stale:
+        htmls = await run_blocking(convert_messages_to_html, [message for _, message in stale])
+        rendered = {message_id: html for (message_id, _), html in zip(stale, htmls)}
+        await repository.update_message_html([(html, RENDERER_VERSION, message_id) for message_id, html in rendered.items()])
+    return [
+        (is_user, message if is_user else rendered.get(message_id, html), timestamp)
+        for message_id, is_user, message, timestamp, html, _ in rows
+    ]
+
 @app.get("/chat", response_class=HTMLResponse)
 async def chat_page(request: Request, conversation_id: str = None):
     # Get available models for each provider
@@ -610,10 +845,7 @@ async def chat_page(request: Request, conversation_id: str = None):
     messages = []
     if conversation_id:
         # Retrieve existing conversation
-        with sqlite3.connect(DB) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT is_user, message, timestamp FROM conversations WHERE conversation_id = ? ORDER BY timestamp", (conversation_id,))
-            messages = cursor.fetchall()
+        messages = await chat_messages(conversation_id)
     else:
         # Generate a new conversation ID
         import uuid
@@ -630,6 +862,17 @@ async def chat_page(request: Request, conversation_id: str = None):
         }
     )
 
+async def conversation_theme(llm_provider, conversation_id, message):
+    """Theme of a conversation: classified on the first interaction, then read back from the database."""
+    theme = None
+    # Whole conversation, not the budgeted history sent to the LLM: the new message is already stored
+    if await repository.count_messages(conversation_id) > 1:
+        # Get the existing theme
+        theme = await repository.fetch_conversation_theme(conversation_id)
+    if theme is None:
+        theme = await llm_provider.aclassify_theme(message, SUBJECT_CATEGORIES, model=THEME_ANALYSIS_MODEL)
+    return theme
+
 @app.post("/chat/{conversation_id}")
 async def chat_message(
     request: Request,
@@ -642,130 +885,119 @@ async def chat_message(
     llm_provider = providers.get(provider)
     
     # Save user message to the database
-    with sqlite3.connect(DB) as conn:
-        conn.execute(
-            "INSERT INTO conversations (conversation_id, timestamp, provider, model, is_user, message) VALUES (?, ?, ?, ?, ?, ?)",
-            (conversation_id, timestamp, provider, model, True, message)
-        )
-        conn.commit()
+    message_id = await repository.insert_message(conversation_id, timestamp, provider, model, True, message)
     
     # Get LLM response
     if llm_provider:
-        # Retrieve conversation history for context
-        with sqlite3.connect(DB) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT is_user, message FROM conversations WHERE conversation_id = ? ORDER BY timestamp", (conversation_id,))
-            history = cursor.fetchall()
-            
-        # Format history for the LLM
-        formatted_history = []
-        for is_user, msg in history:
-            role = "user" if is_user else "assistant"
-            formatted_history.append({"role": role, "content": msg})
+        # Conversation history for context, within the token budget
+        formatted_history = await chat_history.build(conversation_id, message, before_id=message_id)
         
-        # Get response from LLM with conversation history
-        llm_response = llm_provider.get_chat_response(message, formatted_history, model=model)
-        
-        # Convert markdown response to HTML
-        llm_response_html = convert_markdown_to_html(llm_response)
-        
-        # Classify the theme of the conversation
-        if len(formatted_history) <= 1:  # Only for the first interaction
-            theme = llm_provider.classify_theme(message, SUBJECT_CATEGORIES, model=THEME_ANALYSIS_MODEL)
-        else:
-            # Get the existing theme
-            with sqlite3.connect(DB) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT theme FROM conversations WHERE conversation_id = ? AND theme IS NOT NULL LIMIT 1", (conversation_id,))
-                result = cursor.fetchone()
-                theme = result[0] if result else llm_provider.classify_theme(message, SUBJECT_CATEGORIES, model=THEME_ANALYSIS_MODEL)
+        # Get response from LLM with conversation history, and classify the theme of the conversation meanwhile
+        llm_response, theme = await asyncio.gather(
+            llm_provider.aget_chat_response(message, formatted_history, model=model),
+            conversation_theme(llm_provider, conversation_id, message)
+        )
     else:
         llm_response = "Selected provider not available."
-        llm_response_html = llm_response
         theme = "other"
     
-    # Save original markdown response to the database
-    with sqlite3.connect(DB) as conn:
-        conn.execute(
-            "INSERT INTO conversations (conversation_id, timestamp, provider, model, theme, is_user, message) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (conversation_id, datetime.now(), provider, model, theme, False, llm_response)
-        )
-        conn.commit()
+    # Render the response once, and save it along with the original markdown
+    llm_response_html = await run_blocking(convert_markdown_to_html, llm_response)
+    response_timestamp = datetime.now()
+    await repository.insert_message(conversation_id, response_timestamp, provider, model, False, llm_response, theme=theme,
+                                    html=llm_response_html, html_version=RENDERER_VERSION)
+    if llm_provider:
+        # Fold the turns that left the recent window into the summary of the conversation
+        chat_history.refresh(conversation_id, llm_provider, model)
     
-    # Retrieve the updated conversation
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT is_user, message, timestamp FROM conversations WHERE conversation_id = ? ORDER BY timestamp", (conversation_id,))
-        messages = cursor.fetchall()
-    
-    # Convert all assistant messages to HTML for display
-    processed_messages = []
-    for is_user, msg, ts in messages:
-        if not is_user:
-            processed_messages.append((is_user, convert_markdown_to_html(msg), ts))
-        else:
-            processed_messages.append((is_user, msg, ts))
+    # Only the new messages: the chat page already displays the rest of the conversation
+    return HTMLResponse(
+        render_chat_message(conversation_id, (True, message, str(timestamp)))
+        + render_chat_message(conversation_id, (False, llm_response_html, str(response_timestamp)))
+    )
+
+@app.post("/chat/{conversation_id}/stream")
+async def stream_chat_message(
+    conversation_id: str,
+    message: str = Form(...),
+    provider: str = Form(DEFAULT_PROVIDER),
+    model: str = Form(DICT_DEFAULT_MODEL[DEFAULT_PROVIDER])
+):
+    """
+    Reply to a chat message as Server-Sent Events: a "token" event for every piece of the
+    reply, then a "done" event with the rendered message once it is stored.
+    """
+    timestamp = datetime.now()
+    llm_provider = providers.get(provider)
     
-    # Get available models for the response template
-    available_models = {}
-    for provider_name, provider_instance in providers.items():
-        if hasattr(provider_instance, 'get_available_models'):
-            available_models[provider_name] = provider_instance.get_available_models()
+    # Save user message to the database
+    message_id = await repository.insert_message(conversation_id, timestamp, provider, model, True, message)
     
-    return templates.TemplateResponse(
-        "chat.html",
-        {
-            "request": request,
-            "conversation_id": conversation_id,
-            "messages": processed_messages,
-            "providers": providers.keys(),
-            "models": available_models
-        }
-    )
+    async def events():
+        if llm_provider:
+            formatted_history = await chat_history.build(conversation_id, message, before_id=message_id)
+            theme_task = asyncio.create_task(
+                conversation_theme(llm_provider, conversation_id, message)
+            )
+            try:
+                chunks = []
+                async for token in llm_provider.astream_chat_response(message, formatted_history, model=model):
+                    chunks.append(token)
+                    yield sse_event("token", token)
+                llm_response = "".join(chunks)
+                theme = await theme_task
+            except Exception as e:
+                logger.error(f"Streaming chat response failed: {e}")
+                yield sse_event("error", str(e))
+                return
+            finally:
+                theme_task.cancel()
+        else:
+            llm_response = "Selected provider not available."
+            theme = "other"
+            yield sse_event("token", llm_response)
+        
+        # Save the complete markdown response to the database, rendered once
+        llm_response_html = await run_blocking(convert_markdown_to_html, llm_response)
+        response_timestamp = datetime.now()
+        await repository.insert_message(conversation_id, response_timestamp, provider, model, False, llm_response, theme=theme,
+                                        html=llm_response_html, html_version=RENDERER_VERSION)
+        if llm_provider:
+            chat_history.refresh(conversation_id, llm_provider, model)
+        
+        html = render_chat_message(conversation_id, (False, llm_response_html, str(response_timestamp)))
+        yield sse_event("done", {"html": html})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.get("/chat_feedback/{conversation_id}/{message_timestamp}/{helpful}")
 async def chat_feedback(conversation_id: str, message_timestamp: str, helpful: int):
-    with sqlite3.connect(DB) as conn:
-        conn.execute("UPDATE conversations SET helpful = ? WHERE conversation_id = ? AND timestamp = ?", 
-                    (helpful, conversation_id, message_timestamp))
+    await repository.update_feedback(conversation_id, message_timestamp, helpful)
     return {"success": True}
 
 @app.get("/conversations", response_class=HTMLResponse)
-async def view_conversations(request: Request):
-    with sqlite3.connect(DB) as conn:
-        cursor = conn.cursor()
-        # Get distinct conversations with their first message and last update time
-        cursor.execute("""
-            SELECT 
-                c1.conversation_id, 
-                (SELECT message FROM conversations WHERE conversation_id = c1.conversation_id AND is_user = 1 ORDER BY timestamp LIMIT 1) as first_message,
-                MIN(c1.timestamp) as start_time,
-                MAX(c1.timestamp) as last_update,
-                (SELECT theme FROM conversations WHERE conversation_id = c1.conversation_id AND theme IS NOT NULL LIMIT 1) as theme,
-                (SELECT provider FROM conversations WHERE conversation_id = c1.conversation_id LIMIT 1) as provider,
-                (SELECT model FROM conversations WHERE conversation_id = c1.conversation_id LIMIT 1) as model,
-                COUNT(*) as message_count
-            FROM conversations c1
-            GROUP BY c1.conversation_id
-            ORDER BY last_update DESC
-        """)
-        conversations = cursor.fetchall()
+async def view_conversations(request: Request, before: Optional[str] = None, before_id: Optional[str] = None):
+    # One page of conversations with their first message and last update time
+    cursor = (before, before_id) if before is not None and before_id is not None else None
+    conversations = await repository.list_conversations(cursor, CONVERSATIONS_PAGE_SIZE + 1)
+    next_page = None
+    if len(conversations) > CONVERSATIONS_PAGE_SIZE:
+        conversations = conversations[:CONVERSATIONS_PAGE_SIZE]
+        next_page = (conversations[-1][3], conversations[-1][0])
     
     return templates.TemplateResponse(
         "conversations.html",  # You'll need to create this template
-        {"request": request, "conversations": conversations}
+        {"request": request, "conversations": conversations, "next_page": next_page, "first_page": cursor is None}
     )
 
 @app.get("/delete_conversation/{conversation_id}")
 async def delete_conversation(conversation_id: str):
-    with sqlite3.connect(DB) as conn:
-        conn.execute("DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,))
+    await repository.delete_conversation(conversation_id)
     return RedirectResponse(url="/conversations")
 
 @app.get("/clear_conversations")
 async def clear_conversations():
-    with sqlite3.connect(DB) as conn:
-        conn.execute("DELETE FROM conversations")
+    await repository.clear_conversations()
     return RedirectResponse(url="/conversations")
 
 if __name__ == "__main__":
@@ -299,7 +299,8 @@ class ZeroShotPrompter:
             task: ZeroShotTask, 
             input_data: Dict[str, Any], 
             model: Optional[str] = None,
-            temperature: float = 0.0) -> Any:
+            temperature: float = 0.0,
+            cache: Optional[bool] = None) -> Any:
         """
         Run a zero-shot task.
         
@@ -308,23 +309,28 @@ class ZeroShotPrompter:
             input_data: Dictionary of input data for the task
             model: Optional model identifier
             temperature: Sampling temperature for generation
+            cache: Whether to use the response cache of the provider for this call;
+                by default only deterministic (temperature 0) calls are cached
             
         Returns:
             Parsed task result
         """
         # Create prompt using the task
         prompt = task.create_prompt(**input_data)
+        if cache is None:
+            cache = temperature == 0
         
-        # Get response from the provider
-        if hasattr(self.provider, 'get_response'):
-            response = self.provider.get_response(
-                prompt, 
+        # Get response from the provider, through its response cache if it has one
+        if hasattr(self.provider, 'complete'):
+            response = self.provider.complete(
+                [{"role": "user", "content": prompt}],
                 model=model,
-                temperature=temperature
+                temperature=temperature,
+                cache=cache
             )
         else:
-            # Fall back to a simple completion call if the provider doesn't have get_response
-            response = self.provider.complete(prompt, temperature=temperature)
+            # Providers without complete() take no temperature
+            response = self.provider.get_response(prompt, model=model)
         
         # Parse the response using the task
         return task.parse_response(response)
@@ -335,7 +341,8 @@ class ZeroShotPrompter:
                  label_type: str = "categories",
                  model: Optional[str] = None,
                  multi_label: bool = False,
-                 prompt_template: Optional[PromptTemplate] = None) -> Union[str, List[str]]:
+                 prompt_template: Optional[PromptTemplate] = None,
+                 cache: Optional[bool] = None) -> Union[str, List[str]]:
         """
         Convenience method for zero-shot classification.
         
@@ -346,6 +353,7 @@ class ZeroShotPrompter:
             model: Optional model identifier
             multi_label: Whether multiple labels can be assigned
             prompt_template: Custom prompt template
+            cache: Whether to use the response cache of the provider (see run)
             
         Returns:
             Classification result (single label or list)
@@ -359,14 +367,16 @@ class ZeroShotPrompter:
             task=task,
             input_data={"text": text, "label_type": label_type},
             model=model,
-            temperature=0.1  # Slightly higher than 0 for classification
+            temperature=0.1,  # Slightly higher than 0 for classification
+            cache=cache
         )
     
     def answer_question(self,
                         question: str,
                         context: Optional[str] = None,
                         model: Optional[str] = None,
-                        prompt_template: Optional[PromptTemplate] = None) -> str:
+                        prompt_template: Optional[PromptTemplate] = None,
+                        cache: Optional[bool] = None) -> str:
         """
         Convenience method for zero-shot question answering.
         
@@ -375,6 +385,7 @@ class ZeroShotPrompter:
             context: Optional context information
             model: Optional model identifier
             prompt_template: Custom prompt template
+            cache: Whether to use the response cache of the provider (see run)
             
         Returns:
             Answer string
@@ -384,7 +395,8 @@ class ZeroShotPrompter:
             task=task,
             input_data={"question": question, "context": context},
             model=model,
-            temperature=0.4  # More creative for QA
+            temperature=0.4,  # More creative for QA
+            cache=cache
         )
     
     def extract_info(self,
@@ -392,7 +404,8 @@ class ZeroShotPrompter:
                     schema: Dict[str, str],
                     model: Optional[str] = None,
                     output_format: str = "json",
-                    prompt_template: Optional[PromptTemplate] = None) -> Dict[str, Any]:
+                    prompt_template: Optional[PromptTemplate] = None,
+                    cache: Optional[bool] = None) -> Dict[str, Any]:
         """
         Convenience method for zero-shot information extraction.
         
@@ -402,6 +415,7 @@ class ZeroShotPrompter:
             model: Optional model identifier
             output_format: Format for output ("json" or "text")
             prompt_template: Custom prompt template
+            cache: Whether to use the response cache of the provider (see run)
             
         Returns:
             Dictionary of extracted information
@@ -415,7 +429,8 @@ class ZeroShotPrompter:
             task=task,
             input_data={"text": text},
             model=model,
-            temperature=0.0  # Precise extraction
+            temperature=0.0,  # Precise extraction
+            cache=cache
         )
 
 
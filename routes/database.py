@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for
 import os
 import datetime
-import sqlite3
+from database import get_connection
 
 database_bp = Blueprint('database', __name__)
 
@@ -20,17 +20,14 @@ def get_all_questions():
         # Determine the database path - adjust this path as needed
         db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'questions.db')
         
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Use the pooled connection of this thread
+        conn = get_connection(db_path)
         cursor = conn.cursor()
         
-        # Execute query to get all questions
+        # full scan: the page lists every question
         cursor.execute("SELECT * FROM questions ORDER BY id DESC")
         questions = cursor.fetchall()
         
-        # Close connection
-        conn.close()
-        
         return questions
     except Exception as e:
         print(f"Error retrieving questions: {e}")
@@ -79,16 +76,9 @@ def delete_question(question_id):
         # Determine the database path
         db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'questions.db')
         
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Delete the question
-        cursor.execute("DELETE FROM questions WHERE id = ?", (question_id,))
-        conn.commit()
-        
-        # Close connection
-        conn.close()
+        # Delete the question with the pooled connection of this thread
+        with get_connection(db_path) as conn:
+            conn.execute("DELETE FROM questions WHERE id = ?", (question_id,))
         
         # Redirect back to database page
         return redirect(url_for('database_bp.database'))
@@ -103,16 +93,10 @@ def clear_database():
         # Determine the database path
         db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'questions.db')
         
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Clear all questions
-        cursor.execute("DELETE FROM questions")
-        conn.commit()
-        
-        # Close connection
-        conn.close()
+        # Clear all questions with the pooled connection of this thread
+        with get_connection(db_path) as conn:
+            # full scan: clears every question
+            conn.execute("DELETE FROM questions")
         
         # Redirect back to database page
         return redirect(url_for('database_bp.database'))
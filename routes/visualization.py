@@ -1,7 +1,7 @@
-import sqlite3
 from flask import Blueprint, render_template
 import plotly.graph_objects as go
 from utils.data_aggregation import get_questions_by_week, get_difficulty_by_week
+from database import get_connection
 
 visualization_bp = Blueprint('visualization', __name__)
 
@@ -9,21 +9,13 @@ DB_PATH = "database/questions.db"  # Adjust path if needed
 
 @visualization_bp.route('/visualization')
 def visualization():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     
     try:
-        # Create difficulty by week chart
+        # Create difficulty by week chart (already in year and week order)
         difficulty_by_week = get_difficulty_by_week(conn)
-        
-        # Convert to sorted lists for plotting
-        weeks = []
-        difficulties = []
-        
-        # Sort by year and week
-        for week_key in sorted(difficulty_by_week.keys(), 
-                              key=lambda x: tuple(map(int, x.split('-')[::-1]))):
-            weeks.append(week_key)
-            difficulties.append(difficulty_by_week[week_key])
+        weeks = list(difficulty_by_week.keys())
+        difficulties = list(difficulty_by_week.values())
         
         # Create the difficulty graph
         difficulty_fig = go.Figure()
@@ -54,5 +46,3 @@ def visualization():
         
     except Exception as e:
         return render_template('error.html', error=str(e))
-    finally:
-        conn.close()
@@ -0,0 +1,40 @@
+// Send a form with a POST request and read the Server-Sent Events of the response as they arrive.
+// handlers maps an event name ("token", "done", "error", ...) to a function receiving its JSON data.
+async function postEventStream(url, formData, handlers) {
+    const response = await fetch(url, { method: 'POST', body: formData });
+    if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (data && handlers[event]) {
+                handlers[event](JSON.parse(data));
+            }
+        }
+    }
+}
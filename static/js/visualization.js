@@ -0,0 +1,149 @@
+// Charts of the /visualization page, drawn from the compact series of /api/visualization.
+
+const DARK_LAYOUT = {
+    paper_bgcolor: '#1e1e1e',
+    plot_bgcolor: '#1e1e1e',
+    font: { color: '#e0e0e0' },
+    xaxis: { gridcolor: '#333333', zerolinecolor: '#333333' },
+    yaxis: { gridcolor: '#333333', zerolinecolor: '#333333' }
+};
+
+const DIFFICULTY_COLORS = { easy: 'green', medium: 'orange', hard: 'red', unknown: 'gray' };
+const LEVEL_COLORS = { Beginner: 'green', Intermediate: 'orange', Advanced: 'red', Unknown: 'gray' };
+const CHART_CONFIG = { responsive: true };
+
+function layout(title, extra) {
+    return Object.assign({ title: { text: title } }, DARK_LAYOUT, extra, {
+        xaxis: Object.assign({}, DARK_LAYOUT.xaxis, extra && extra.xaxis),
+        yaxis: Object.assign({}, DARK_LAYOUT.yaxis, extra && extra.yaxis)
+    });
+}
+
+function showMessage(id, message) {
+    const element = document.getElementById(id);
+    Plotly.purge(element);
+    element.innerHTML = `<div class='alert alert-info'>${message}</div>`;
+}
+
+function draw(id, traces, chartLayout) {
+    const element = document.getElementById(id);
+    const notice = element.querySelector('.alert');
+    if (notice) {
+        notice.remove();
+    }
+    Plotly.react(element, traces, chartLayout, CHART_CONFIG);
+}
+
+function drawThemes(data) {
+    // One trace per theme, so that every theme gets its colour and legend entry
+    draw('chart-themes', data.themes.labels.map((theme, i) => ({
+        type: 'bar', name: theme, x: [theme], y: [data.themes.counts[i]]
+    })), layout('Distribution of Question Themes', {
+        xaxis: { title: { text: 'Theme Categories' } }, yaxis: { title: { text: 'Count' } }
+    }));
+
+    const byTheme = new Map();
+    data.subthemes.forEach(([theme, subtheme, count]) => {
+        if (!byTheme.has(theme)) {
+            byTheme.set(theme, { type: 'bar', name: theme, x: [], y: [] });
+        }
+        byTheme.get(theme).x.push(subtheme);
+        byTheme.get(theme).y.push(count);
+    });
+    draw('chart-subthemes', Array.from(byTheme.values()), layout('Distribution of Question Subthemes', {
+        barmode: 'group', xaxis: { title: { text: 'Subtheme Categories' } }, yaxis: { title: { text: 'Count' } }
+    }));
+
+    draw('chart-errors', [{
+        type: 'pie', labels: data.error_messages.labels, values: data.error_messages.counts
+    }], layout('Distribution of Error Messages vs Regular Questions'));
+
+    if (data.difficulty) {
+        draw('chart-difficulty', data.difficulty.labels.map((difficulty, i) => ({
+            type: 'bar', name: difficulty, x: [difficulty], y: [data.difficulty.counts[i]],
+            marker: { color: DIFFICULTY_COLORS[difficulty] }
+        })), layout('Distribution of Question Difficulty', {
+            xaxis: { title: { text: 'Difficulty Level' } }, yaxis: { title: { text: 'Count' } }
+        }));
+    } else {
+        showMessage('chart-difficulty', 'No difficulty data available');
+    }
+
+    if (data.helpful.labels.length) {
+        draw('chart-helpful', [{
+            type: 'pie', labels: data.helpful.labels, values: data.helpful.counts,
+            marker: { colors: data.helpful.labels.map(label => label === 'Helpful' ? 'green' : 'red') }
+        }], layout('User Feedback: Helpful vs Not Helpful Responses'));
+    } else {
+        showMessage('chart-helpful', 'No feedback yet');
+    }
+}
+
+function drawDailyDifficulty(daily) {
+    const days = daily.days;
+    const axes = { hovermode: 'x unified', xaxis: { title: { text: 'Date' } } };
+
+    draw('chart-daily-ratio', ['Beginner', 'Intermediate', 'Advanced'].map(level => ({
+        type: 'scatter', mode: 'lines', stackgroup: 'ratio', name: level, x: days, y: daily[level],
+        line: { color: LEVEL_COLORS[level] }
+    })), layout('Daily Question Difficulty Ratios', Object.assign({}, axes, {
+        yaxis: { title: { text: 'Percentage (%)' } }, legend: { title: { text: 'Difficulty Level' } }
+    })));
+
+    draw('chart-daily-ratio-line', Object.keys(LEVEL_COLORS).map(level => ({
+        type: 'scatter', mode: 'lines', name: level, x: days, y: daily[level]
+    })), layout('Daily Ratio of Question Difficulty Over Time (Days)', Object.assign({}, axes, {
+        yaxis: { title: { text: 'Ratio (%)' } }, legend: { title: { text: 'Difficulty' } }
+    })));
+}
+
+async function loadCharts(form) {
+    const params = new URLSearchParams();
+    new FormData(form).forEach((value, key) => {
+        if (value) {
+            params.append(key, value);
+        }
+    });
+    const message = document.getElementById('chart-message');
+    message.textContent = 'Loading...';
+
+    const response = await fetch(`/api/visualization?${params}`);
+    if (!response.ok) {
+        message.textContent = `Could not load the chart data (status ${response.status})`;
+        return;
+    }
+    const data = await response.json();
+    message.textContent = `${data.total} questions`;
+
+    if (!data.total) {
+        document.querySelectorAll('.chart').forEach(chart => showMessage(chart.id, 'No data available for visualization'));
+        return;
+    }
+    drawThemes(data);
+    if (data.daily_difficulty) {
+        drawDailyDifficulty(data.daily_difficulty);
+    } else {
+        showMessage('chart-daily-ratio', 'No difficulty data available for daily ratio visualization');
+        showMessage('chart-daily-ratio-line', 'No difficulty data available for difficulty ratio line chart');
+    }
+}
+
+function toggleExpander(id) {
+    const content = document.getElementById(id);
+    if (content.style.display === "none" || content.style.display === "") {
+        content.style.display = "block";
+        // Charts drawn while hidden have no width yet
+        content.querySelectorAll('.js-plotly-plot').forEach(chart => Plotly.Plots.resize(chart));
+    } else {
+        content.style.display = "none";
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('visualization-filters');
+    form.addEventListener('submit', event => {
+        event.preventDefault();
+        loadCharts(form);
+    });
+    loadCharts(form);
+});
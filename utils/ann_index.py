@@ -0,0 +1,307 @@
+import logging
+import threading
+
+import numpy as np
+
+from utils.embedding_models import top_k
+
+logger = logging.getLogger(__name__)
+
+
+def _normalise_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def spherical_kmeans(vectors, n_clusters, iterations=10, seed=0, chunk_size=65536):
+    """
+    Cluster L2-normalised vectors by cosine similarity.
+
+    Returns:
+        np.ndarray: (n_clusters, dim) matrix of normalised centroids
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_to_centroids(vectors, centroids, chunk_size)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # Re-seed empty clusters with random vectors so every list stays usable
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = _normalise_rows(sums)
+    return centroids
+
+
+def assign_to_centroids(vectors, centroids, chunk_size=65536):
+    """Index of the most similar centroid for every row, computed in chunks to bound memory."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        assignments[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignments
+
+
+class _InvertedList:
+    """Growable contiguous block of normalised vectors and their ids."""
+
+    def __init__(self, dim, capacity=16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, item_id, vector):
+        if self.size == len(self.ids):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.ids = np.concatenate([self.ids, np.empty_like(self.ids)])
+        self.vectors[self.size] = vector
+        self.ids[self.size] = item_id
+        self.size += 1
+        return self.size - 1
+
+    def pop(self, position):
+        """Remove a row by moving the last one into its slot. Returns the id of the moved row, if any."""
+        last = self.size - 1
+        moved = None
+        if position != last:
+            self.vectors[position] = self.vectors[last]
+            self.ids[position] = self.ids[last]
+            moved = int(self.ids[position])
+        self.size = last
+        return moved
+
+
+class IVFFlatIndex:
+    """
+    Approximate nearest-neighbour index (IVF-flat) over question embeddings, in pure NumPy.
+
+    Vectors are L2-normalised and split into inverted lists around spherical k-means
+    centroids. A search only scores the n_probe lists whose centroids are closest to
+    the query, so n_probe trades recall for latency. Until the index holds
+    train_threshold vectors it keeps a single list, i.e. it behaves like an exact search.
+
+    The interface matches utils.vector_index.VectorIndex.
+    """
+
+    def __init__(self, n_lists: int = 0, n_probe: int = 8, train_threshold: int = 10000,
+                 kmeans_iterations: int = 10, training_sample: int = 64, seed: int = 0):
+        """
+        Args:
+            n_lists: Number of inverted lists, 0 to use sqrt(number of vectors) when training
+            n_probe: Number of lists scored per search
+            train_threshold: Minimum number of vectors before clustering
+            kmeans_iterations: Iterations of spherical k-means
+            training_sample: Vectors sampled per list to train the centroids
+            seed: Seed of the k-means initialisation
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_threshold = train_threshold
+        self.kmeans_iterations = kmeans_iterations
+        self.training_sample = training_sample
+        self.seed = seed
+        self._lock = threading.RLock()
+        self._train_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._centroids = None
+        self._lists = []
+        self._positions = {}
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    @property
+    def dim(self):
+        return None if self._centroids is None else self._centroids.shape[1]
+
+    @property
+    def is_trained(self):
+        return self._centroids is not None and len(self._centroids) > 1
+
+    @property
+    def needs_training(self):
+        """True once enough vectors are indexed to cluster them, and again every time the
+        index has grown four-fold since the last clustering, so the lists stay balanced."""
+        size = len(self._positions)
+        return size >= self.train_threshold and size >= 4 * self._trained_size
+
+    def ids(self):
+        return list(self._positions)
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    def _nearest_list(self, vector):
+        if len(self._centroids) == 1:
+            return 0
+        return int(np.argmax(self._centroids @ vector))
+
+    def add(self, item_id, vector):
+        """Add or replace the vector of an item. Returns False if the vector cannot be indexed."""
+        vector = self._normalise(vector)
+        if vector is None:
+            return False
+        with self._lock:
+            if self._centroids is None:
+                # Untrained index: a single list centred on the first vector
+                self._centroids = vector[None, :].copy()
+                self._lists = [_InvertedList(vector.shape[0])]
+            elif vector.shape[0] != self._centroids.shape[1]:
+                logger.warning(f"Skipping vector {item_id}: dimension {vector.shape[0]} != {self._centroids.shape[1]}")
+                return False
+            if item_id in self._positions:
+                self.remove(item_id)
+            list_no = self._nearest_list(vector)
+            self._positions[item_id] = (list_no, self._lists[list_no].append(item_id, vector))
+        return True
+
+    def add_many(self, items):
+        """Add an iterable of (id, vector) pairs. Returns the number of indexed vectors."""
+        return sum(self.add(item_id, vector) for item_id, vector in items)
+
+    def remove(self, item_id):
+        with self._lock:
+            location = self._positions.pop(item_id, None)
+            if location is None:
+                return False
+            list_no, position = location
+            moved = self._lists[list_no].pop(position)
+            if moved is not None:
+                self._positions[moved] = (list_no, position)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def train(self):
+        """
+        Cluster the indexed vectors and rebuild the inverted lists.
+
+        The clustering runs on a snapshot without holding the index lock, so searches and
+        inserts keep working meanwhile; changes made during training are replayed at the end.
+        Returns False if another training is already running.
+        """
+        if not self._train_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                if not self._positions:
+                    return True
+                ids = np.concatenate([lst.ids[:lst.size] for lst in self._lists])
+                vectors = np.concatenate([lst.vectors[:lst.size] for lst in self._lists])
+
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+            rng = np.random.default_rng(self.seed)
+            sample_size = min(len(vectors), n_lists * self.training_sample)
+            sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+            centroids = spherical_kmeans(sample, n_lists, self.kmeans_iterations, self.seed)
+            assignments = assign_to_centroids(vectors, centroids)
+
+            with self._lock:
+                old_lists, old_positions = self._lists, self._positions
+                self._build(centroids, ids, vectors, assignments)
+                snapshot_ids = set(ids.tolist())
+                for item_id in snapshot_ids - old_positions.keys():
+                    self.remove(item_id)
+                for item_id in old_positions.keys() - snapshot_ids:
+                    list_no, position = old_positions[item_id]
+                    self.add(item_id, old_lists[list_no].vectors[position])
+            logger.info(f"Trained IVF index: {len(vectors)} vectors in {len(centroids)} lists")
+            return True
+        finally:
+            self._train_lock.release()
+
+    def _build(self, centroids, ids, vectors, assignments):
+        self._centroids = centroids
+        self._lists = []
+        self._positions = {}
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        for list_no in range(len(centroids)):
+            rows = order[bounds[list_no]:bounds[list_no + 1]]
+            inverted_list = _InvertedList(centroids.shape[1], capacity=max(16, 2 * len(rows)))
+            inverted_list.vectors[:len(rows)] = vectors[rows]
+            inverted_list.ids[:len(rows)] = ids[rows]
+            inverted_list.size = len(rows)
+            self._lists.append(inverted_list)
+            for position, item_id in enumerate(ids[rows].tolist()):
+                self._positions[item_id] = (list_no, position)
+        self._trained_size = len(ids) if len(centroids) > 1 else 0
+
+    def search(self, vector, k: int = 2, min_similarity: float = None, n_probe: int = None):
+        """
+        Find approximately the k rows most similar to a vector.
+
+        Args:
+            vector: Query embedding (does not need to be normalised)
+            k: Number of neighbours to return
+            min_similarity: Only return neighbours at least this similar
+            n_probe: Lists to score for this query, defaults to the index setting
+
+        Returns:
+            list: (id, cosine similarity) tuples sorted by decreasing similarity
+        """
+        query = self._normalise(vector)
+        with self._lock:
+            if query is None or not self._positions or query.shape[0] != self._centroids.shape[1]:
+                return []
+            n_probe = min(n_probe or self.n_probe, len(self._centroids))
+            if n_probe < len(self._centroids):
+                probes = np.argpartition(-(self._centroids @ query), n_probe - 1)[:n_probe]
+            else:
+                probes = range(len(self._centroids))
+
+            scores, ids = [], []
+            for list_no in probes:
+                inverted_list = self._lists[list_no]
+                if inverted_list.size:
+                    scores.append(inverted_list.vectors[:inverted_list.size] @ query)
+                    ids.append(inverted_list.ids[:inverted_list.size])
+            if not scores:
+                return []
+            scores = np.concatenate(scores)
+            ids = np.concatenate(ids)
+
+        top, top_scores = top_k(scores, k, min_similarity)
+        return list(zip(ids[top].tolist(), top_scores.tolist()))
+
+    def save(self, path):
+        """Save the centroids and inverted lists to a .npz file."""
+        with self._lock:
+            if self._centroids is None:
+                return
+            sizes = np.array([lst.size for lst in self._lists], dtype=np.int64)
+            np.savez(
+                path,
+                centroids=self._centroids,
+                sizes=sizes,
+                ids=np.concatenate([lst.ids[:lst.size] for lst in self._lists]),
+                vectors=np.concatenate([lst.vectors[:lst.size] for lst in self._lists]),
+                trained_size=np.int64(self._trained_size),
+            )
+
+    def load(self, path):
+        """Replace the content of the index with a file written by save()."""
+        with np.load(path) as data:
+            centroids = data['centroids']
+            sizes = data['sizes']
+            ids, vectors = data['ids'], data['vectors']
+            trained_size = int(data['trained_size'])
+        with self._lock:
+            self._build(centroids, ids, vectors, np.repeat(np.arange(len(centroids)), sizes))
+            self._trained_size = trained_size
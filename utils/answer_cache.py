@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+
+from config import (
+    DB_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_HOURS,
+    ANSWER_CACHE_MAX_ENTRIES,
+)
+from database import get_connection
+from utils.embedding_storage import pack_embedding, unpack_embedding
+from utils.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    Semantic cache of LLM answers, keyed on (provider, model, question embedding).
+
+    A question is served from the cache when a previous question sent to the same
+    provider and model is at least `threshold` cosine-similar and its answer is younger
+    than the TTL. Entries live in the answer_cache table; their embeddings are kept in
+    one in-memory VectorIndex per (provider, model). Beyond max_entries, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl_hours: float = ANSWER_CACHE_TTL_HOURS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._entry_keys = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        if not self._loaded:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS answer_cache (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        provider TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        embedding BLOB NOT NULL,
+                        answer TEXT NOT NULL,
+                        answer_html TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used_at REAL NOT NULL,
+                        hits INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_last_used ON answer_cache (last_used_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_answer_cache_created ON answer_cache (created_at)")
+            self._load(conn)
+        return conn
+
+    def _load(self, conn):
+        """Index the embeddings of the unexpired entries."""
+        with self._lock:
+            if self._loaded:
+                return
+            rows = conn.execute(
+                "SELECT id, provider, model, embedding FROM answer_cache WHERE created_at > ?", (time.time() - self.ttl,)
+            ).fetchall()
+            for entry_id, provider, model, embedding in rows:
+                self._index_entry(entry_id, provider, model, unpack_embedding(embedding))
+            self._loaded = True
+        logger.info(f"Answer cache holds {len(rows)} entries")
+
+    def load(self):
+        """Create the table and index the cached questions (otherwise done on first use)."""
+        self._connect()
+
+    def _index_entry(self, entry_id, provider, model, embedding):
+        index = self._indexes.setdefault((provider, model), VectorIndex(initial_capacity=64))
+        if index.add(entry_id, embedding):
+            self._entry_keys[entry_id] = (provider, model)
+
+    def _forget(self, entry_ids):
+        with self._lock:
+            for entry_id in entry_ids:
+                key = self._entry_keys.pop(entry_id, None)
+                if key is not None:
+                    self._indexes[key].remove(entry_id)
+
+    def lookup(self, provider: str, model: str, embedding):
+        """
+        Find a cached answer to a question similar enough to this one.
+
+        Returns:
+            dict: question, answer, answer_html and similarity of the cached entry, or None
+        """
+        conn = self._connect()
+        index = self._indexes.get((provider, model))
+        matches = index.search(embedding, k=1, min_similarity=self.threshold) if index is not None else []
+        if not matches:
+            self.misses += 1
+            return None
+
+        entry_id, similarity = matches[0]
+        now = time.time()
+        with conn:
+            row = conn.execute(
+                "SELECT question, answer, answer_html, created_at FROM answer_cache WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is not None and row[3] > now - self.ttl:
+                conn.execute("UPDATE answer_cache SET last_used_at = ?, hits = hits + 1 WHERE id = ?", (now, entry_id))
+            elif row is not None:
+                conn.execute("DELETE FROM answer_cache WHERE id = ?", (entry_id,))
+                row = None
+                self.evictions += 1
+        if row is None:
+            self._forget([entry_id])
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        question, answer, answer_html, _ = row
+        return {"question": question, "answer": answer, "answer_html": answer_html, "similarity": similarity}
+
+    def store(self, provider: str, model: str, question: str, embedding, answer: str, answer_html: str):
+        """Cache an answer, then evict expired and least recently used entries beyond the size limit."""
+        if not len(embedding):
+            return
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO answer_cache (provider, model, question, embedding, answer, answer_html, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (provider, model, question, pack_embedding(embedding), answer, answer_html, now, now)
+            )
+            with self._lock:
+                self._index_entry(cursor.lastrowid, provider, model, embedding)
+
+            evicted = [entry_id for (entry_id,) in conn.execute(
+                "SELECT id FROM answer_cache WHERE created_at <= ?", (now - self.ttl,)
+            )]
+            overflow = len(self._entry_keys) - len(evicted) - self.max_entries
+            if overflow > 0:
+                evicted += [entry_id for (entry_id,) in conn.execute(
+                    "SELECT id FROM answer_cache WHERE created_at > ? ORDER BY last_used_at LIMIT ?",
+                    (now - self.ttl, overflow)
+                )]
+            if evicted:
+                conn.executemany("DELETE FROM answer_cache WHERE id = ?", [(entry_id,) for entry_id in evicted])
+        if evicted:
+            self._forget(evicted)
+            self.evictions += len(evicted)
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entry_keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "threshold": self.threshold,
+            "ttl_hours": self.ttl / 3600,
+            "max_entries": self.max_entries,
+        }
+
+
+# Shared by the question endpoints of main.py
+answer_cache = AnswerCache()
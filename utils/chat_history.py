@@ -0,0 +1,178 @@
+import asyncio
+import functools
+import logging
+import re
+from datetime import datetime
+
+from config import (
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_HISTORY_RECENT_TURNS,
+    CHAT_SUMMARY_MAX_TOKENS,
+    CHAT_SUMMARY_MODEL,
+)
+from llm_providers.base import CHAT_SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+# Words and punctuation marks; a word counts one token per 4 characters, every mark one token.
+# This overestimates the BPE tokenizers of the providers a little on prose and code alike.
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Role and separators of every message of a chat request
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running summary of a conversation between a user and an AI assistant. "
+    "Update the current summary with the new messages. Keep the facts, decisions, names, code "
+    "identifiers and open questions needed to continue the conversation, drop pleasantries. "
+    "Answer with the updated summary only, in at most {words} words."
+)
+
+
+def count_tokens(text: str) -> int:
+    """Estimated number of tokens of a text (see _TOKEN_PATTERN)."""
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def count_message_tokens(text: str) -> int:
+    """Estimated number of tokens of a chat message of this content."""
+    return count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """The beginning of a text that fits in an estimated number of tokens, marked as cut."""
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += (len(match.group()) + 3) // 4
+        if used > tokens:
+            return text[:match.start()].rstrip() + " [...]"
+    return text
+
+
+def fit_history(summary, messages, message, budget=CHAT_HISTORY_TOKEN_BUDGET):
+    """
+    History of a chat request whose prompt fits in the token budget.
+
+    Args:
+        summary: Rolling summary of the turns before messages, or None
+        messages: (id, is_user, message) rows not in the summary yet, oldest first
+        message: New user message, sent whole after the history (the history gets what it leaves)
+        budget: Estimated tokens of the whole prompt: system prompt, history and new message
+
+    Returns:
+        list: {"role", "content"} dicts: the summary, then the latest messages that fit, oldest first.
+        Messages between the two are left out until the summary catches up with them.
+    """
+    remaining = budget - count_message_tokens(CHAT_SYSTEM_PROMPT) - count_message_tokens(message)
+    history = []
+    if summary and remaining > MESSAGE_OVERHEAD_TOKENS:
+        content = truncate_to_tokens(SUMMARY_PREFIX + summary, remaining - MESSAGE_OVERHEAD_TOKENS)
+        history.append({"role": "system", "content": content})
+        remaining -= count_message_tokens(content)
+
+    recent = []
+    for _, is_user, text in reversed(messages):
+        cost = count_message_tokens(text)
+        if cost > remaining:
+            # A single message larger than the budget is cut rather than left out entirely
+            if not recent and remaining > MESSAGE_OVERHEAD_TOKENS:
+                text = truncate_to_tokens(text, remaining - MESSAGE_OVERHEAD_TOKENS)
+                recent.append({"role": "user" if is_user else "assistant", "content": text})
+            break
+        recent.append({"role": "user" if is_user else "assistant", "content": text})
+        remaining -= cost
+    return history + recent[::-1]
+
+
+def summary_messages(summary, messages, max_tokens=CHAT_SUMMARY_MAX_TOKENS):
+    """Request folding (id, is_user, message) rows into a rolling summary."""
+    transcript = "\n\n".join(f"{'User' if is_user else 'Assistant'}: {text}" for _, is_user, text in messages)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=max_tokens * 3 // 4)},
+        {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
+
+
+class ChatHistory:
+    """
+    Token-budgeted history of the chat conversations.
+
+    Every chat request gets the rolling summary of its conversation followed by the turns
+    the summary does not cover yet, newest first as long as they fit in the token budget.
+    Once recent_turns more turns than the latest recent_turns are out of the summary (or
+    these turns no longer fit in the budget), a background task folds them into the summary
+    with the LLM of the conversation, a batch at a time; the latest recent_turns always stay
+    verbatim. The summary and the id of the last message it covers are stored per
+    conversation_id in chat_history_summaries. A late or failed summary never makes a
+    prompt larger, the turns it misses are only left out of the prompts meanwhile.
+    """
+
+    def __init__(self, repository, budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+                 recent_turns: int = CHAT_HISTORY_RECENT_TURNS, summary_tokens: int = CHAT_SUMMARY_MAX_TOKENS,
+                 summary_model: str = CHAT_SUMMARY_MODEL):
+        self.repository = repository
+        self.budget = budget
+        self.recent_messages = 2 * recent_turns
+        self.summary_tokens = summary_tokens
+        self.summary_model = summary_model
+        self._tasks = {}
+
+    async def build(self, conversation_id, message, before_id=None):
+        """
+        History to send along with a new message of a conversation.
+
+        Args:
+            message: The new user message
+            before_id: Id of the stored new message, so that it is not part of its own history
+        """
+        summary, summarized_until = await self.repository.fetch_history_summary(conversation_id) or (None, 0)
+        messages = await self.repository.fetch_messages_since(conversation_id, summarized_until, before_id)
+        return fit_history(summary, messages, message, self.budget)
+
+    def refresh(self, conversation_id, llm_provider, model):
+        """Fold the turns that left the recent window into the summary, in the background."""
+        task = self._tasks.get(conversation_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._summarize(conversation_id, llm_provider, self.summary_model or model))
+            task.add_done_callback(functools.partial(self._done, conversation_id))
+            self._tasks[conversation_id] = task
+        return task
+
+    async def stop(self):
+        """Cancel the summaries being computed, they are computed again after the next message."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _done(self, conversation_id, task):
+        if self._tasks.get(conversation_id) is task:
+            del self._tasks[conversation_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Summarizing the chat history failed, the last summary is kept: {task.exception()}")
+
+    async def _summarize(self, conversation_id, llm_provider, model):
+        while True:
+            summary, summarized_until = await self.repository.fetch_history_summary(conversation_id) or (None, 0)
+            messages = await self.repository.fetch_messages_since(conversation_id, summarized_until)
+            older = messages[:-self.recent_messages] if self.recent_messages > 0 else messages
+            tokens = sum(count_message_tokens(text) for _, _, text in messages)
+            if not older or (len(older) < max(self.recent_messages, 1) and tokens <= self.budget):
+                return
+
+            # Fold a budget of messages at a time, so that a long backlog never makes a request too large
+            chunk, tokens = [], 0
+            for message_id, is_user, text in older:
+                cost = count_message_tokens(text)
+                if chunk and tokens + cost > self.budget:
+                    break
+                chunk.append((message_id, is_user, truncate_to_tokens(text, self.budget)))
+                tokens += cost
+
+            summary = await llm_provider.acomplete(
+                summary_messages(summary, chunk, self.summary_tokens), model=model, temperature=0,
+                max_tokens=self.summary_tokens
+            )
+            await self.repository.save_history_summary(conversation_id, summary.strip(), chunk[-1][0], datetime.now())
@@ -1,101 +1,81 @@
-from datetime import datetime
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple
 import sqlite3
 import json
-from .data_validation import validate_metadata
+
+# Day of a question (questions without a timestamp count as asked today)
+_DAY_SQL = "date(COALESCE(timestamp, datetime('now', 'localtime')))"
+
+def _iso_week_sql(day: str) -> str:
+    """
+    SQL of the ISO year and week number of a date column: weeks run Monday to Sunday
+    and belong to the year of their Thursday (strftime has no ISO week before SQLite 3.46).
+    """
+    thursday = f"date({day}, '-3 days', 'weekday 4')"
+    return f"CAST(substr({thursday}, 1, 4) AS INTEGER), (CAST(strftime('%j', {thursday}) AS INTEGER) - 1) / 7 + 1"
 
 def get_questions_by_week(db_connection: sqlite3.Connection) -> Dict[str, List[Tuple]]:
     """
     Aggregates questions by week number and year from the database.
-    
+
     Args:
         db_connection: SQLite database connection
-        
+
     Returns:
-        Dictionary with keys as 'week_number-year' and values as lists of question tuples
+        Dictionary with keys as 'week_number-year' (ISO week and year) and values as lists
+        of question tuples, in (year, week) order
     """
-    cursor = db_connection.cursor()
-    
-    # Query to get all questions with timestamps
-    cursor.execute("""
-        SELECT id, question, timestamp, model_name, metadata 
+    # Every row is returned, so rows are only grouped by day here; the few distinct
+    # days are then bucketed into weeks, instead of computing a week for every row.
+    questions_by_day = {}
+    # full scan: every question is returned
+    for row in db_connection.execute(f"""
+        SELECT {_DAY_SQL}, id, question, timestamp, model_name, metadata
         FROM questions
         ORDER BY timestamp
-    """)
-    
+    """):
+        questions_by_day.setdefault(row[0], []).append(row[1:])
+
+    weeks = db_connection.execute(f"""
+        SELECT value, {_iso_week_sql('value')}
+        FROM json_each(?)
+        ORDER BY 2, 3, value
+    """, (json.dumps(list(questions_by_day)),))
+
     questions_by_week = {}
-    
-    for question in cursor.fetchall():
-        question_id, question_text, timestamp, model_name, metadata = question
-        
-        # Convert timestamp to datetime
-        dt = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
-        
-        # Get week number and year
-        week_number = dt.isocalendar()[1]
-        year = dt.year
-        
-        # Use week-year as key
-        key = f"{week_number}-{year}"
-        
-        if key not in questions_by_week:
-            questions_by_week[key] = []
-            
-        questions_by_week[key].append(question)
-    
+    for day, year, week in weeks:
+        questions_by_week.setdefault(f"{week}-{year}", []).extend(questions_by_day[day])
+
     return questions_by_week
 
 def get_difficulty_by_week(db_connection: sqlite3.Connection) -> Dict[str, float]:
     """
     Calculates average difficulty score by week from the database.
-    
+
     Args:
         db_connection: SQLite database connection
-        
+
     Returns:
-        Dictionary with keys as 'week_number-year' and values as average difficulty scores
+        Dictionary with keys as 'week_number-year' (ISO week and year) and values as average
+        difficulty scores, in (year, week) order
     """
-    cursor = db_connection.cursor()
-    
-    # Query to get all questions with timestamps and metadata
-    cursor.execute("""
-        SELECT timestamp, metadata 
-        FROM questions
-        WHERE metadata IS NOT NULL
-        ORDER BY timestamp
+    # Difficulties are the numbers of the metadata JSON, clamped to 0-10 like validate_metadata
+    # does; they are summed per day first, so the week is only computed once per day.
+    # full scan: every question with metadata is averaged
+    cursor = db_connection.execute(f"""
+        SELECT {_iso_week_sql('day')}, ROUND(TOTAL(total) / SUM(count), 2)
+        FROM (
+            SELECT day, TOTAL(MIN(MAX(difficulty, 0), 10)) AS total, COUNT(*) AS count
+            FROM (
+                SELECT {_DAY_SQL} AS day,
+                       CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.difficulty') END AS difficulty
+                FROM questions
+                WHERE metadata IS NOT NULL
+            )
+            WHERE typeof(difficulty) IN ('integer', 'real')
+            GROUP BY day
+        )
+        GROUP BY 1, 2
+        ORDER BY 1, 2
     """)
-    
-    difficulty_by_week = {}
-    count_by_week = {}
-    
-    for timestamp, metadata in cursor.fetchall():
-        # Convert timestamp to datetime
-        dt = datetime.fromisoformat(timestamp) if timestamp else datetime.now()
-        
-        # Get week number and year
-        week_number = dt.isocalendar()[1]
-        year = dt.year
-        
-        # Use week-year as key
-        key = f"{week_number}-{year}"
-        
-        # Validate metadata
-        metadata_dict = validate_metadata(metadata)
-        
-        if metadata_dict and 'difficulty' in metadata_dict:
-            difficulty = metadata_dict['difficulty']
-            
-            if key not in difficulty_by_week:
-                difficulty_by_week[key] = 0
-                count_by_week[key] = 0
-            
-            difficulty_by_week[key] += difficulty
-            count_by_week[key] += 1
-    
-    # Calculate averages
-    avg_difficulty_by_week = {}
-    for key in difficulty_by_week:
-        if count_by_week[key] > 0:
-            avg_difficulty_by_week[key] = round(difficulty_by_week[key] / count_by_week[key], 2)
-    
-    return avg_difficulty_by_week
+
+    return {f"{week}-{year}": average for year, week, average in cursor}
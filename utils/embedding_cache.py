@@ -0,0 +1,142 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from config import DB_PATH, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_MAX_ROWS
+from database import get_connection
+from utils.embedding_storage import pack_embedding, unpack_embedding
+
+
+def normalise_text(text: str) -> str:
+    """Normalise unicode and whitespace so trivially different copies of a text share a cache entry."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed on the model name and a hash of the normalised text:
+    an in-memory LRU in front of the embedding_cache table.
+
+    Embeddings are kept and returned as read-only float32 arrays (about 3 KB for 768
+    dimensions), shared by every caller instead of copied. Beyond max_rows, the rows of
+    the table read or written least recently are evicted; hits of the in-memory LRU do
+    not refresh their row, which the in-memory copy serves anyway.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, max_entries: int = EMBEDDING_CACHE_SIZE,
+                 max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._rows = None
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalise_text(text)}".encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        if self._rows is None:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        dim INTEGER NOT NULL,
+                        vector BLOB NOT NULL,
+                        created_at DATETIME NOT NULL,
+                        last_used_at REAL NOT NULL DEFAULT 0
+                    )
+                """)
+                columns = [column[1] for column in conn.execute("PRAGMA table_info(embedding_cache)")]
+                if 'last_used_at' not in columns:
+                    conn.execute("ALTER TABLE embedding_cache ADD COLUMN last_used_at REAL NOT NULL DEFAULT 0")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used_at)")
+                # full scan: once, to start the running row count (read from the smallest index)
+                rows = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            with self._lock:
+                if self._rows is None:
+                    self._rows = rows
+        return conn
+
+    @staticmethod
+    def _freeze(vector):
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        return vector
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, model: str, text: str):
+        """Return the cached embedding as a read-only float32 array, or None."""
+        key = self.make_key(model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                return vector
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT vector FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE embedding_cache SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            return None
+        # unpack_embedding returns a read-only view of the BLOB, no copy is needed
+        vector = unpack_embedding(row[0])
+        self._remember(key, vector)
+        return vector
+
+    def put(self, model: str, text: str, vector):
+        """Cache an embedding and return it as the read-only float32 array stored."""
+        if not len(vector):
+            return vector
+        key = self.make_key(model, text)
+        vector = self._freeze(vector)
+        with self._connect() as conn:
+            previous = conn.execute("SELECT 1 FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, len(vector), pack_embedding(vector), datetime.now(), time.time())
+            )
+            with self._lock:
+                if previous is None:
+                    self._rows += 1
+                overflow = self._rows - self.max_rows
+            if overflow > 0:
+                self._evict(conn, overflow)
+        self._remember(key, vector)
+        return vector
+
+    def _evict(self, conn, overflow):
+        """Delete the `overflow` least recently used rows."""
+        cursor = conn.execute(
+            "DELETE FROM embedding_cache WHERE key IN (SELECT key FROM embedding_cache ORDER BY last_used_at LIMIT ?)",
+            (overflow,)
+        )
+        with self._lock:
+            self._rows -= cursor.rowcount
+
+    def get_or_compute(self, model: str, text: str, compute):
+        """Return the cached embedding (a read-only float32 array), or compute it with compute(text) and cache it."""
+        vector = self.get(model, text)
+        if vector is None:
+            vector = self.put(model, text, compute(text))
+        return vector
+
+
+# Shared by utils.embedding_models and the providers
+embedding_cache = EmbeddingCache()
@@ -1,31 +1,112 @@
+import numpy as np
 import ollama
 
+from utils.embedding_cache import embedding_cache
+
 
 # Initialize ollama provider
 EMBEDDING_MODEL = 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf'
 
 
 def get_embedding(chunk):
-    """Get embedding for the provided text"""
-    return ollama.embed(model=EMBEDDING_MODEL, input=chunk)['embeddings'][0]
+    """Get embedding for the provided text, served from the embedding cache when possible"""
+    return embedding_cache.get_or_compute(
+        EMBEDDING_MODEL, chunk, lambda text: ollama.embed(model=EMBEDDING_MODEL, input=text)['embeddings'][0]
+    )
 
 
 def cosine_similarity(a, b):
-  dot_product = sum([x * y for x, y in zip(a, b)])
-  norm_a = sum([x ** 2 for x in a]) ** 0.5
-  norm_b = sum([x ** 2 for x in b]) ** 0.5
-  return dot_product / (norm_a * norm_b)
-
-
-def retrieve_n_closest_vectors(query, VECTOR_DB, top_n=2):
-  # TODO: we get it as text in the first place, so translate it first.
-  query_embedding = get_embedding(query)
-  # temporary list to store (chunk, similarity) pairs
-  similarities = []
-  for chunk, embedding in VECTOR_DB:
-    similarity = cosine_similarity(query_embedding, embedding)
-    similarities.append((chunk, similarity))
-  # sort by similarity in descending order, because higher similarity means more relevant chunks
-  similarities.sort(key=lambda x: x[1], reverse=True)
-  # finally, return the top N most relevant chunks
-  return similarities[:top_n]
\ No newline at end of file
+  a = np.asarray(a, dtype=np.float32)
+  b = np.asarray(b, dtype=np.float32)
+  return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def row_norms(matrix):
+  """L2 norm of every row, to be cached and passed to the batch functions below."""
+  return np.linalg.norm(np.asarray(matrix, dtype=np.float32), axis=1)
+
+
+def cosine_similarity_matrix(queries, matrix, matrix_norms=None):
+  """
+  Cosine similarity of one or many query vectors against every row of a matrix in a single product.
+
+  Args:
+    queries: (dim,) or (n_queries, dim) array-like
+    matrix: (n_rows, dim) array-like
+    matrix_norms: Cached row norms of the matrix, computed when not given
+
+  Returns:
+    np.ndarray: (n_queries, n_rows) similarities, or (n_rows,) for a single query
+  """
+  queries = np.asarray(queries, dtype=np.float32)
+  matrix = np.asarray(matrix, dtype=np.float32)
+  if matrix_norms is None:
+    matrix_norms = row_norms(matrix)
+  query_norms = np.linalg.norm(queries, axis=-1, keepdims=True)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    scores = (queries / query_norms) @ matrix.T / matrix_norms
+  return np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def top_k(scores, k, min_similarity=None):
+  """
+  Indices and values of the k highest scores of a 1-D array, in decreasing order.
+
+  Uses a partial selection (argpartition) instead of sorting every score, and
+  optionally keeps only the scores at or above min_similarity.
+  """
+  scores = np.asarray(scores)
+  candidates = None
+  if min_similarity is not None:
+    candidates = np.flatnonzero(scores >= min_similarity)
+    scores = scores[candidates]
+  k = min(k, len(scores))
+  if k <= 0:
+    return np.empty(0, dtype=np.int64), scores[:0]
+  top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+  top = top[np.argsort(-scores[top], kind='stable')]
+  return (top if candidates is None else candidates[top]), scores[top]
+
+
+def top_k_similar(queries, matrix, k=2, min_similarity=None, matrix_norms=None):
+  """
+  Score one or many queries against a matrix and keep the k best rows of each.
+
+  Returns:
+    list: (row index, similarity) tuples for a single query, or one such list per query
+  """
+  scores = cosine_similarity_matrix(queries, matrix, matrix_norms)
+  if scores.ndim == 1:
+    indices, values = top_k(scores, k, min_similarity)
+    return list(zip(indices.tolist(), values.tolist()))
+  results = []
+  for row in scores:
+    indices, values = top_k(row, k, min_similarity)
+    results.append(list(zip(indices.tolist(), values.tolist())))
+  return results
+
+
+class EmbeddingMatrix:
+  """Embeddings stacked in a float32 matrix with cached row norms, for repeated batch searches."""
+
+  def __init__(self, vectors):
+    self.vectors = np.asarray(vectors, dtype=np.float32)
+    self.norms = row_norms(self.vectors)
+
+  def __len__(self):
+    return len(self.vectors)
+
+  def search(self, queries, k=2, min_similarity=None):
+    return top_k_similar(queries, self.vectors, k, min_similarity, self.norms)
+
+
+def retrieve_n_closest_vectors(query, VECTOR_DB, top_n=2, query_embedding=None, min_similarity=None):
+  # Reuse the embedding when the caller already computed it
+  if query_embedding is None:
+    query_embedding = get_embedding(query)
+  if not VECTOR_DB:
+    return []
+  chunks = [chunk for chunk, _ in VECTOR_DB]
+  matrix = EmbeddingMatrix([embedding for _, embedding in VECTOR_DB])
+  # the top N most relevant chunks, most similar first
+  return [(chunks[i], similarity) for i, similarity in matrix.search(query_embedding, top_n, min_similarity)]
@@ -0,0 +1,73 @@
+import json
+import logging
+import sqlite3
+import sys
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Embeddings are stored as packed little-endian float32 values
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+def pack_embedding(vector) -> bytes:
+    """Pack an embedding into a float32 BLOB."""
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(blob) -> np.ndarray:
+    """Decode a float32 BLOB without copying it (the returned array is read-only)."""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def migrate_text_embeddings(conn: sqlite3.Connection, model: str, batch_size: int = 500) -> int:
+    """
+    Convert embeddings stored as JSON text into float32 BLOBs.
+
+    Every batch is committed on its own and only rows still holding text are selected,
+    so an interrupted migration simply resumes where it stopped.
+
+    Args:
+        conn: SQLite connection to the questions database
+        model: Name of the embedding model recorded for the converted rows
+        batch_size: Number of rows converted per transaction
+
+    Returns:
+        int: Number of converted rows
+    """
+    converted = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, embedding FROM questions WHERE typeof(embedding) = 'text' LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for q_id, q_embedding in rows:
+            try:
+                vector = json.loads(q_embedding.replace("'", "\""))
+            except json.JSONDecodeError as e:
+                logger.error(f"Dropping unparsable embedding of question {q_id}: {e}")
+                vector = None
+            if vector:
+                updates.append((pack_embedding(vector), len(vector), model, q_id))
+            else:
+                updates.append((None, None, None, q_id))
+
+        with conn:
+            conn.executemany(
+                "UPDATE questions SET embedding = ?, embedding_dim = ?, embedding_model = ? WHERE id = ?", updates
+            )
+        converted += len(rows)
+        logger.info(f"Converted {converted} text embeddings to float32 BLOBs")
+    return converted
+
+
+if __name__ == "__main__":
+    from utils.embedding_models import EMBEDDING_MODEL
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "questions.db"
+    with sqlite3.connect(db_path) as conn:
+        print(f"Converted {migrate_text_embeddings(conn, EMBEDDING_MODEL)} embeddings in {db_path}")
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+from config import THEME_ANALYSIS_MODEL
+from utils.error_detection import detect_error_message
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking provider/database call in a worker thread so the event loop stays free."""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+# Marks the end of a generator iterated by iterate_blocking
+_END = object()
+
+
+async def iterate_blocking(func, *args, **kwargs):
+    """
+    Iterate a blocking generator, such as a streamed provider response, from a worker thread.
+
+    Items are handed to the event loop as soon as they are produced. If the consumer
+    stops early (e.g. the client disconnected), the generator is closed after its next item.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def publish(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # The event loop is closed
+            stopped.set()
+
+    def produce():
+        iterator = func(*args, **kwargs)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                publish(item)
+        except Exception as e:
+            publish(None, e)
+        finally:
+            getattr(iterator, "close", lambda: None)()
+            publish(_END)
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                break
+            yield item
+        await producer
+    finally:
+        stopped.set()
+
+
+async def classify_question(llm_provider, question, question_embedding=None, theme_classifier=None):
+    """
+    Classify a question with a single structured analysis call.
+
+    When a theme_classifier is confident about the labels of the question embedding,
+    the analysis call only lists those labels, so the LLM is left with the error flag
+    and the difficulty. Otherwise the LLM picks the labels and the classifier learns
+    from them. Texts that clearly contain (or clearly lack) error output get their
+    error flag from utils.error_detection rather than from the LLM.
+
+    Args:
+        llm_provider: Provider instance exposing aanalyze_question
+        question: The question text
+        question_embedding: Optional embedding of the question
+        theme_classifier: Optional utils.theme_classifier.EmbeddingThemeClassifier
+
+    Returns:
+        dict: theme, subtheme, is_error_msg, difficulty and theme_source ("embedding" or "llm") of the question
+    """
+    is_error_msg = detect_error_message(question)
+    use_classifier = theme_classifier is not None and question_embedding is not None
+    labels = theme_classifier.classify(question_embedding) if use_classifier else None
+    if labels is not None:
+        theme, subtheme = labels
+        analysis = await llm_provider.aanalyze_question(question, model=THEME_ANALYSIS_MODEL, categories={theme: [subtheme]})
+        analysis.update(theme=theme, subtheme=subtheme, theme_source="embedding")
+    else:
+        analysis = await llm_provider.aanalyze_question(question, model=THEME_ANALYSIS_MODEL)
+        analysis["theme_source"] = "llm"
+        if use_classifier:
+            theme_classifier.add(question_embedding, analysis["theme"], analysis["subtheme"])
+    if is_error_msg is not None:
+        analysis["is_error_msg"] = is_error_msg
+    return analysis
@@ -0,0 +1,152 @@
+import asyncio
+import functools
+import logging
+from datetime import datetime, timedelta
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentQueue:
+    """
+    Durable queue of question enrichment jobs, stored in the enrichment_jobs table
+    and drained by a bounded pool of asyncio workers.
+
+    Jobs left 'running' by a crash are picked up again on the next start, failed jobs
+    are retried with exponential backoff and pending jobs are drained on shutdown.
+    """
+
+    def __init__(self, db_path, handler, workers=2, max_attempts=5, retry_delay=5.0, poll_interval=2.0):
+        """
+        Args:
+            db_path: Path of the SQLite database holding the enrichment_jobs table
+            handler: Coroutine function called as handler(question_id, provider) for each job
+            workers: Number of jobs processed concurrently
+            max_attempts: Attempts before a job is marked as failed
+            retry_delay: Base delay in seconds before retrying a failed job (doubled on every attempt)
+            poll_interval: Seconds an idle worker waits before looking for due retries
+        """
+        self.db_path = db_path
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self._wakeup = None
+        self._tasks = []
+        self._stopping = False
+
+    def enqueue(self, conn, question_id, provider):
+        """Add a job using the caller's connection, so it commits together with the question row."""
+        now = datetime.now()
+        conn.execute(
+            "INSERT INTO enrichment_jobs (question_id, provider, status, attempts, next_attempt_at, created_at) VALUES (?, ?, 'pending', 0, ?, ?)",
+            (question_id, provider, now, now)
+        )
+
+    def notify(self):
+        """Wake up idle workers after new jobs have been committed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        """Requeue jobs interrupted by a previous shutdown and start the workers."""
+        requeued = await asyncio.to_thread(self._requeue_running_jobs)
+        if requeued:
+            logger.info(f"Requeued {requeued} interrupted enrichment jobs")
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Started {self.workers} enrichment workers")
+
+    async def stop(self, timeout=30.0):
+        """Let the workers finish the jobs that are due, then stop them."""
+        self._stopping = True
+        self.notify()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout) if self._tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Cancelled jobs stay 'running' and are requeued by the next start()
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Enrichment queue not fully drained after {timeout}s")
+        self._tasks = []
+        logger.info("Enrichment workers stopped")
+
+    async def _worker(self, n):
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim_job)
+            except Exception as e:
+                # e.g. "database is locked": the worker backs off and keeps polling
+                logger.error(f"Enrichment worker {n} could not claim a job: {e}")
+                if self._stopping:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job is None:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, question_id, provider, attempts = job
+            try:
+                await self.handler(question_id, provider)
+            except Exception as e:
+                logger.error(f"Enrichment job {job_id} for question {question_id} failed (attempt {attempts}): {e}")
+                outcome = functools.partial(self._fail_job, job_id, attempts, str(e))
+            else:
+                outcome = functools.partial(self._complete_job, job_id)
+
+            try:
+                await asyncio.to_thread(outcome)
+            except Exception as e:
+                # The job stays 'running' and is requeued by the next start()
+                logger.error(f"Enrichment worker {n} could not record the outcome of job {job_id}: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def _requeue_running_jobs(self):
+        with get_connection(self.db_path) as conn:
+            return conn.execute("UPDATE enrichment_jobs SET status = 'pending' WHERE status = 'running'").rowcount
+
+    def _claim_job(self):
+        conn = get_connection(self.db_path)
+        with conn:
+            # Take the write lock before reading so two workers never claim the same job
+            conn.execute("BEGIN IMMEDIATE")
+            job = conn.execute(
+                "SELECT id, question_id, provider, attempts FROM enrichment_jobs WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                (datetime.now(),)
+            ).fetchone()
+            if job is not None:
+                conn.execute(
+                    "UPDATE enrichment_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (datetime.now(), job[0])
+                )
+        if job is None:
+            return None
+        job_id, question_id, provider, attempts = job
+        return job_id, question_id, provider, attempts + 1
+
+    def _complete_job(self, job_id):
+        with get_connection(self.db_path) as conn:
+            conn.execute("DELETE FROM enrichment_jobs WHERE id = ?", (job_id,))
+
+    def _fail_job(self, job_id, attempts, error):
+        now = datetime.now()
+        if attempts >= self.max_attempts:
+            status, next_attempt_at = 'failed', now
+        else:
+            status, next_attempt_at = 'pending', now + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+        with get_connection(self.db_path) as conn:
+            conn.execute(
+                "UPDATE enrichment_jobs SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, next_attempt_at, now, job_id)
+            )
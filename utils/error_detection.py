@@ -0,0 +1,73 @@
+import re
+from typing import Optional
+
+# Lines that only appear in pasted error output: tracebacks, stack frames, compiler
+# and database diagnostics, error codes. One of them is enough to call the text an error message.
+ERROR_OUTPUT_PATTERNS = (
+    # Python
+    r"Traceback \(most recent call last\):",
+    r'^\s*File "[^"]+", line \d+',
+    r"\b(?:[\w$]+\.)*[A-Z][\w$]*(?:Error|Exception|Exit|Interrupt|Fault)(?: \[[^\]\n]*\])?: \S",
+    r"\b(?:sqlite3|psycopg2?|pymysql|MySQLdb|sqlalchemy\.exc)\.\w*(?:Error|Exception)\b",
+    r"\b[\w.]+\.(?:exceptions?|errors|exc)\.[A-Z]\w*: \S",
+    # Rust
+    r"^error(?:\[E\d{4}\])?: ",
+    r"^\s*--> [\w./\\-]+:\d+:\d+",
+    r"thread '[^'\n]+' panicked at",
+    # C, C++ and other compilers: path:line[:column]: error
+    r"^[\w./\\ -]+\.\w{1,4}:\d+(?::\d+)?: (?:fatal )?error\b",
+    r"^[\w./\\ -]+\.\w{1,4}\(\d+(?:,\d+)?\): (?:fatal )?error [A-Z]+\d+",
+    r"undefined reference to `",
+    r"\b(?:collect2|ld): error:",
+    r"terminate called after throwing an instance of",
+    r"Segmentation fault|\(core dumped\)|double free or corruption",
+    # JavaScript / TypeScript and Java stack frames
+    r"^\s+at (?:[\w$.<>\[\] ]+ \()?(?:file:///)?[\w:/\\.@ -]+:\d+:\d+\)?\s*$",
+    r"^\s+at [\w$.]+\([\w$]+\.(?:java|kt|scala):\d+\)",
+    r'^Exception in thread "',
+    r"^Caused by: [\w$.]+",
+    r"npm ERR!|UnhandledPromiseRejection|error TS\d{4}:",
+    # SQL engines
+    r"^ERROR:\s+\S",
+    r"ERROR \d{4} \(\w{5}\)",
+    r"\bORA-\d{5}\b",
+    r"SQLSTATE\[\w+\]",
+    r"\bMsg \d+, Level \d+, State \d+",
+    r"syntax error at or near \"",
+    # Shells and tools
+    r"^(?:fatal|FATAL|panic|PANIC|Error|ERROR)(?:\[\w+\])?: \S",
+    r"(?:command not found|No such file or directory|Permission denied)\s*$",
+    r"\b(?:exited with|exit) (?:code|status) [1-9]\d*\b",
+)
+
+# Words that make a text about errors without proving it contains one: left to the LLM
+ERROR_VOCABULARY = (
+    r"\b(?:errors?|exceptions?|traceback|stack ?trace|panic(?:ked|s)?|crash(?:es|ed|ing)?|segfaults?|"
+    r"fail(?:s|ed|ing|ure)?|warnings?|bugs?|broken|undefined|not working|doesn't work|does not work|exit code)\b",
+    r"\b[A-Z]\w*(?:Error|Exception)\b",
+)
+
+# Pasted output is read from both ends: tracebacks and diagnostics start or end a paste
+MAX_SCANNED_CHARS = 16384
+
+_ERROR_OUTPUT = re.compile("|".join(f"(?:{pattern})" for pattern in ERROR_OUTPUT_PATTERNS), re.MULTILINE)
+_ERROR_VOCABULARY = re.compile("|".join(f"(?:{pattern})" for pattern in ERROR_VOCABULARY), re.IGNORECASE)
+
+
+def detect_error_message(text: str) -> Optional[bool]:
+    """
+    Decide locally whether a text contains an error message, when the answer is clear.
+
+    Returns:
+        bool: True if the text contains error output (traceback, stack frames, compiler
+        or database diagnostics), False if it does not even talk about errors,
+        None when it is ambiguous and should go to the LLM
+    """
+    if len(text) > MAX_SCANNED_CHARS:
+        half = MAX_SCANNED_CHARS // 2
+        text = f"{text[:half]}\n{text[-half:]}"
+    if _ERROR_OUTPUT.search(text):
+        return True
+    if _ERROR_VOCABULARY.search(text):
+        return None
+    return False
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Last rendering of a page, along with the version of the data it was rendered from.
+
+    Requests on unchanged data get the stored rendering for the cost of reading the
+    version. Once the version moves on, requests keep getting the stale rendering
+    while a single background task renders the new data (stale-while-revalidate);
+    only the very first request waits for a rendering.
+    """
+
+    def __init__(self, render, version):
+        """
+        Args:
+            render: Coroutine function returning the rendering of the current data
+            version: Coroutine function returning the data version, which changes on every write
+        """
+        self.render = render
+        self.version = version
+        self._value = None
+        self._value_version = None
+        self._task = None
+
+    async def _refresh(self, version):
+        value = await self.render()
+        self._value, self._value_version = value, version
+
+    @staticmethod
+    def _log_failure(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Rendering failed, the last rendering is kept: {task.exception()}")
+
+    def _start_refresh(self, version):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh(version))
+            self._task.add_done_callback(self._log_failure)
+        return self._task
+
+    async def get(self):
+        """The rendering of the current data, or the last one while it is being rendered again."""
+        # The version is read before the data, so a write racing a rendering only makes it stale
+        version = await self.version()
+        if self._value is not None and version == self._value_version:
+            return self._value
+        task = self._start_refresh(version)
+        if self._value is not None:
+            return self._value
+        # shield: a client going away does not cancel a rendering other requests wait on
+        await asyncio.shield(task)
+        return self._value
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+import time
+
+from config import RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB
+from database import get_connection
+
+
+class ResponseCache:
+    """
+    On-disk cache of LLM completions keyed on (provider, model, messages, temperature,
+    max_tokens and any other request option), for the deterministic classifier and
+    prompting calls: asking the same thing twice returns the stored text.
+
+    Entries live in their own SQLite file. Once their total size exceeds max_mb, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, db_path: str = RESPONSE_CACHE_PATH, max_mb: float = RESPONSE_CACHE_MAX_MB):
+        self.db_path = db_path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: list, temperature=None, max_tokens=None, **options) -> str:
+        request = {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "options": options,
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        conn = get_connection(self.db_path)
+        if self._total_bytes is None:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS response_cache (
+                        key TEXT PRIMARY KEY,
+                        provider TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used_at, size)")
+                # full scan: once, to start the running total of the cache size
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+            with self._lock:
+                if self._total_bytes is None:
+                    self._total_bytes = total
+        return conn
+
+    def get(self, key: str):
+        """Return the cached response, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE response_cache SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, provider: str, model: str, response: str):
+        size = len(key) + len(response.encode('utf-8'))
+        with self._connect() as conn:
+            previous = conn.execute("SELECT size FROM response_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, provider, model, response, size, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, size, time.time())
+            )
+            with self._lock:
+                self._total_bytes += size - (previous[0] if previous else 0)
+                overflow = self._total_bytes - self.max_bytes
+            if overflow > 0:
+                self._evict(conn, overflow)
+
+    def _evict(self, conn, overflow):
+        """Delete the least recently used entries until `overflow` bytes are freed."""
+        evicted, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY last_used_at"):
+            if freed >= overflow:
+                break
+            evicted.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", evicted)
+        with self._lock:
+            self._total_bytes -= freed
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_mb": (self._total_bytes or 0) / (1024 * 1024),
+            "max_mb": self.max_bytes / (1024 * 1024),
+        }
+
+
+# Attached to the providers of main.py when RESPONSE_CACHE_ENABLED is set
+response_cache = ResponseCache()
@@ -0,0 +1,175 @@
+import logging
+import threading
+
+import numpy as np
+
+from config import (
+    DB_PATH,
+    DICT_CATEGORIES,
+    THEME_CLASSIFIER_MIN_MARGIN,
+    THEME_CLASSIFIER_MIN_EXAMPLES,
+    THEME_CLASSIFIER_PRIOR_WEIGHT,
+)
+from database import get_connection
+from utils.embedding_models import get_embedding
+from utils.embedding_storage import unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def load_labelled_questions(conn):
+    """(id, question, theme, subtheme, embedding) of the questions labelled by an LLM, embedding unpacked."""
+    rows = conn.execute(
+        # full scan: training reads every labelled question
+        "SELECT id, question, theme, subtheme, embedding FROM questions WHERE theme IS NOT NULL AND embedding IS NOT NULL AND (theme_source IS NULL OR theme_source = 'llm')"
+    ).fetchall()
+    return [(q_id, question, theme, subtheme, unpack_embedding(embedding)) for q_id, question, theme, subtheme, embedding in rows]
+
+
+def _normalise(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class EmbeddingThemeClassifier:
+    """
+    Theme and subtheme of a question predicted from its embedding, without an LLM call.
+
+    Every label has a prototype: the embedding of a short description of the label,
+    weighted as `prior_weight` questions, plus the normalised embeddings of the
+    questions an LLM gave that label. A question takes the most similar theme, then
+    the most similar subtheme of that theme. The prediction is only trusted when each
+    label leads its runner-up by `min_margin` and the theme has been seen on at least
+    `min_examples` labelled questions.
+    """
+
+    def __init__(self, categories: dict = DICT_CATEGORIES, min_margin: float = THEME_CLASSIFIER_MIN_MARGIN,
+                 min_examples: int = THEME_CLASSIFIER_MIN_EXAMPLES, prior_weight: float = THEME_CLASSIFIER_PRIOR_WEIGHT,
+                 embed=get_embedding):
+        self.categories = categories
+        self.min_margin = min_margin
+        self.min_examples = min_examples
+        self.prior_weight = prior_weight
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._sums = {}
+        self._counts = {}
+        self._themes = list(categories)
+        self._theme_matrix = None
+        self._subtheme_matrices = {}
+        self._dirty = True
+        self.ready = False
+
+    @property
+    def examples(self) -> int:
+        """Number of labelled questions learnt from."""
+        return sum(self._counts.get((theme,), 0) for theme in self._themes)
+
+    def describe(self, theme, subtheme=None) -> str:
+        if subtheme is None:
+            return f"A question about {theme}: {', '.join(self.categories[theme])}"
+        return f"A question about {subtheme} in {theme}"
+
+    def _labels(self):
+        for theme, subthemes in self.categories.items():
+            yield (theme,)
+            for subtheme in subthemes:
+                yield (theme, subtheme)
+
+    def fit(self, labelled=()):
+        """
+        Start over from the label descriptions and learn from some labelled questions.
+
+        Args:
+            labelled: (theme, subtheme, embedding) of questions labelled by an LLM
+        """
+        with self._lock:
+            self._sums = {label: self.prior_weight * _normalise(self.embed(self.describe(*label))) for label in self._labels()}
+            self._counts = {}
+            self._dirty = True
+        for theme, subtheme, embedding in labelled:
+            self.add(embedding, theme, subtheme)
+        self.ready = True
+
+    def load(self, db_path: str = DB_PATH):
+        """Fit on the questions labelled by an LLM so far. The classifier stays unused if the embeddings are unavailable."""
+        try:
+            with get_connection(db_path) as conn:
+                rows = load_labelled_questions(conn)
+            self.fit((theme, subtheme, embedding) for _, _, theme, subtheme, embedding in rows)
+        except Exception as e:
+            logger.warning(f"Theme classifier unavailable, every question goes to the LLM: {e}")
+            return
+        logger.info(f"Theme classifier fitted on {self.examples} labelled questions")
+
+    def add(self, embedding, theme, subtheme=None):
+        """Learn from a question labelled by an LLM (labels outside the categories are ignored)."""
+        if theme not in self.categories or not len(embedding):
+            return
+        vector = _normalise(embedding)
+        labels = [(theme,)]
+        if subtheme in self.categories[theme]:
+            labels.append((theme, subtheme))
+        with self._lock:
+            if not self._sums:
+                return
+            for label in labels:
+                self._sums[label] = self._sums[label] + vector
+                self._counts[label] = self._counts.get(label, 0) + 1
+            self._dirty = True
+
+    def _prototypes(self):
+        with self._lock:
+            if self._dirty:
+                self._theme_matrix = np.stack([_normalise(self._sums[(theme,)]) for theme in self._themes])
+                self._subtheme_matrices = {
+                    theme: np.stack([_normalise(self._sums[(theme, subtheme)]) for subtheme in subthemes])
+                    for theme, subthemes in self.categories.items() if subthemes
+                }
+                self._dirty = False
+            return self._theme_matrix, self._subtheme_matrices
+
+    @staticmethod
+    def _best(scores):
+        """Index of the best score and its lead over the second best."""
+        best = int(np.argmax(scores))
+        if len(scores) < 2:
+            return best, float("inf")
+        runner_up = np.partition(scores, -2)[-2]
+        return best, float(scores[best] - runner_up)
+
+    def predict(self, embedding):
+        """
+        Most likely labels of a question, however unsure.
+
+        Returns:
+            tuple: theme, subtheme (None if the theme has none), theme margin, subtheme margin
+        """
+        theme_matrix, subtheme_matrices = self._prototypes()
+        vector = _normalise(embedding)
+        best, theme_margin = self._best(theme_matrix @ vector)
+        theme = self._themes[best]
+        if theme not in subtheme_matrices:
+            return theme, None, theme_margin, float("inf")
+        best, subtheme_margin = self._best(subtheme_matrices[theme] @ vector)
+        return theme, self.categories[theme][best], theme_margin, subtheme_margin
+
+    def classify(self, embedding):
+        """
+        Labels of a question when the prediction is confident.
+
+        Returns:
+            tuple: (theme, subtheme), or None when the question should go to the LLM
+        """
+        if not self.ready or embedding is None or not len(embedding):
+            return None
+        theme, subtheme, theme_margin, subtheme_margin = self.predict(embedding)
+        if (subtheme is None or self._counts.get((theme,), 0) < self.min_examples
+                or min(theme_margin, subtheme_margin) < self.min_margin):
+            return None
+        return theme, subtheme
+
+
+# Shared by the enrichment jobs of main.py
+theme_classifier = EmbeddingThemeClassifier()
@@ -0,0 +1,123 @@
+import logging
+import threading
+
+import numpy as np
+
+from utils.embedding_models import top_k
+
+logger = logging.getLogger(__name__)
+
+
+class VectorIndex:
+    """
+    In-memory exact nearest-neighbour index over question embeddings.
+
+    Rows are L2-normalised once when added and kept in a contiguous float32 matrix,
+    so a cosine-similarity search is a single matrix-vector product followed by a
+    partial top-k selection with argpartition.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._capacity = initial_capacity
+        self._matrix = None
+        self._ids = np.empty(initial_capacity, dtype=np.int64)
+        self._positions = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    @property
+    def dim(self):
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    def ids(self):
+        return self._ids[:self._size].tolist()
+
+    @staticmethod
+    def _normalise(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if vector.size == 0 or norm == 0:
+            return None
+        return vector / norm
+
+    def _reserve(self, size, dim):
+        if self._matrix is None:
+            self._matrix = np.empty((self._capacity, dim), dtype=np.float32)
+        if size <= self._capacity:
+            return
+        while self._capacity < size:
+            self._capacity *= 2
+        matrix = np.empty((self._capacity, self._matrix.shape[1]), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.empty(self._capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def add(self, item_id, vector):
+        """Add or replace the vector of an item. Returns False if the vector cannot be indexed."""
+        vector = self._normalise(vector)
+        if vector is None:
+            return False
+        with self._lock:
+            if self._matrix is not None and vector.shape[0] != self._matrix.shape[1]:
+                logger.warning(f"Skipping vector {item_id}: dimension {vector.shape[0]} != {self._matrix.shape[1]}")
+                return False
+            position = self._positions.get(item_id)
+            if position is None:
+                self._reserve(self._size + 1, vector.shape[0])
+                position = self._size
+                self._size += 1
+                self._positions[item_id] = position
+                self._ids[position] = item_id
+            self._matrix[position] = vector
+        return True
+
+    def add_many(self, items):
+        """Add an iterable of (id, vector) pairs. Returns the number of indexed vectors."""
+        return sum(self.add(item_id, vector) for item_id, vector in items)
+
+    def remove(self, item_id):
+        """Remove an item by moving the last row into its slot."""
+        with self._lock:
+            position = self._positions.pop(item_id, None)
+            if position is None:
+                return False
+            last = self._size - 1
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                self._ids[position] = self._ids[last]
+                self._positions[int(self._ids[position])] = position
+            self._size = last
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._positions = {}
+            self._size = 0
+
+    def search(self, vector, k: int = 2, min_similarity: float = None):
+        """
+        Find the k rows most similar to a vector.
+
+        Args:
+            vector: Query embedding (does not need to be normalised)
+            k: Number of neighbours to return
+            min_similarity: Only return neighbours at least this similar
+
+        Returns:
+            list: (id, cosine similarity) tuples sorted by decreasing similarity
+        """
+        query = self._normalise(vector)
+        with self._lock:
+            if query is None or self._size == 0 or query.shape[0] != self._matrix.shape[1]:
+                return []
+            scores = self._matrix[:self._size] @ query
+            top, top_scores = top_k(scores, k, min_similarity)
+            return list(zip(self._ids[top].tolist(), top_scores.tolist()))